@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+External (out-of-core) k-way merge sort for memory-mapped arrays
+Andrew J. Graves
+10/18/26
+"""
+
+# Import modules
+import os
+import shutil
+import tempfile
+import tracemalloc
+import numpy as np
+from heap_sort import Heap
+
+# Sort fixed-size runs of src and write each run to its own file
+def sort_runs(src, run_size, tmp_dir):
+
+    runs = []
+    for start in range(0, len(src), run_size):
+        # Only one run of the input is held in memory at a time
+        run = np.sort(src[start:start + run_size])
+        path = os.path.join(tmp_dir, f'run_{len(runs)}.bin')
+        run.tofile(path)
+        runs.append(path)
+    return runs
+
+# k-way merge of sorted run files into dst (a path), driven by a min-heap
+# Each run is streamed through a buffer of buffer_size elements; the heap is
+# keyed by the last buffered value of each run, so every value up to the top
+# key is already buffered and can be merged as one block
+def merge_runs(runs, dst, dtype, buffer_size):
+
+    # Open every run and load its first buffer
+    files = [np.memmap(path, dtype=dtype, mode='r') if os.path.getsize(path)
+             else np.zeros(0, dtype=dtype) for path in runs]
+    n = sum(len(f) for f in files)
+    bufs = [np.array(f[:buffer_size]) for f in files]
+    offsets = [len(buf) for buf in bufs] # file position after each buffer
+    idx = [0] * len(runs) # position within each buffer
+
+    # Output file (an empty input leaves an empty file)
+    if n == 0:
+        open(dst, 'wb').close()
+        return 0
+    out = np.memmap(dst, dtype=dtype, mode='w+', shape=(n,))
+    k = 0
+
+    # Min-heap of the last buffered value of each run (item = run id)
+    heap = Heap(order='min', items=[])
+    for r, buf in enumerate(bufs):
+        if len(buf):
+            heap.push(buf[-1], r)
+
+    while len(heap):
+        key, r = heap.peek()
+
+        # Every buffered value up to the key, from every run
+        parts = []
+        for s in range(len(runs)):
+            stop = idx[s] + np.searchsorted(bufs[s][idx[s]:], key, 'right')
+            parts.append(bufs[s][idx[s]:stop])
+            idx[s] = stop
+        # Merge the sorted pieces and write them out
+        block = np.sort(np.concatenate(parts), kind='stable')
+        out[k:k + len(block)] = block
+        k += len(block)
+
+        # The top run is used up, so refill its buffer
+        f = files[r]
+        bufs[r] = buf = np.array(f[offsets[r]:offsets[r] + buffer_size])
+        offsets[r] += len(buf)
+        idx[r] = 0
+        # Drop the run when it is exhausted
+        if len(buf):
+            heap.replace(buf[-1], r)
+        else:
+            heap.pop()
+
+    out.flush()
+    del out, files
+    return n
+
+# External merge sort of src (an array or np.memmap) into the file dst
+# run_size: elements per sorted run; fan_in: runs merged at once
+# buffer_size: elements buffered per run during a merge
+# trace_memory: measure peak memory of allocations with tracemalloc
+# Returns the sorted np.memmap and a dict of statistics
+def external_sort(src, dst, run_size=2**20, fan_in=16, buffer_size=2**14,
+                  tmp_dir=None, trace_memory=False):
+
+    if fan_in < 2:
+        raise ValueError('fan_in must be at least 2')
+    dtype = src.dtype
+    if trace_memory:
+        tracemalloc.start()
+
+    tmp_dir = tempfile.mkdtemp(dir=tmp_dir)
+    try:
+        # Sort the runs
+        runs = sort_runs(src, run_size, tmp_dir)
+        num_runs = len(runs)
+        passes = 0
+
+        # Merge fan_in runs at a time until one merge is left
+        while len(runs) > fan_in:
+            merged = []
+            for i in range(0, len(runs), fan_in):
+                path = os.path.join(tmp_dir, f'pass_{passes}_{len(merged)}.bin')
+                merge_runs(runs[i:i + fan_in], path, dtype, buffer_size)
+                merged.append(path)
+            # Remove the runs of the previous pass
+            for path in runs:
+                os.remove(path)
+            runs = merged
+            passes += 1
+
+        # Final merge into the output file
+        n = merge_runs(runs, dst, dtype, buffer_size)
+        passes += 1
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    # Report the memory held by buffers (a run and its sorted copy, or the
+    # merge buffers and the merged block)
+    stats = {'runs': num_runs, 'passes': passes,
+             'buffer_bytes': 2 * max(min(run_size, len(src)),
+                                     fan_in * buffer_size) * dtype.itemsize}
+    if trace_memory:
+        stats['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    if n == 0:
+        return np.zeros(0, dtype=dtype), stats
+    return np.memmap(dst, dtype=dtype, mode='r+', shape=(n,)), stats
+
+if __name__ == '__main__':
+
+    # Initialize failure count
+    failures = 0
+    test_dir = tempfile.mkdtemp()
+    # Iterate through random arrays with several run sizes and fan-ins
+    for j, (run_size, fan_in) in enumerate([(100, 2), (333, 3), (5000, 16)]):
+        # Generate random memory-mapped test array
+        test_array = np.memmap(os.path.join(test_dir, f'test_{j}.bin'),
+                               dtype=np.int64, mode='w+', shape=(10000,))
+        test_array[:] = np.random.randint(-999, 999, size=10000)
+        # Sort it out of core
+        out, stats = external_sort(test_array,
+                                   os.path.join(test_dir, f'sorted_{j}.bin'),
+                                   run_size, fan_in, buffer_size=64,
+                                   trace_memory=True)
+        print(stats)
+
+        # Ensure external sort returns same result as np.sort
+        if not np.array_equal(out, np.sort(test_array)):
+            print('Random testing failed!')
+            failures += 1
+        del out, test_array
+    shutil.rmtree(test_dir)
+
+    if failures == 0:
+        print('Passed all random tests!')
\ No newline at end of file
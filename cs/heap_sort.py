@@ -8,84 +8,324 @@ Andrew J. Graves
 # Import modules
 import numpy as np
 
-# Bare-bones heap data structure with methods relevant for heapsort
+# Array-backed heap with heapsort and priority-queue methods
 class Heap:
-    
+
     # The notation for the following methods follows the CLSR description (Ch 6)
-    
+
+    # Fixed attributes (no per-instance dict)
+    __slots__ = ('A', 'heapsize', 'is_max', 'items', 'pos')
+
     # Constructor for Heap class
-    def __init__(self, arr):
+    # arr: keys (sorted in place by heapsort; a list if you need push)
+    # order: 'max' or 'min' heap
+    # items: optional payloads kept alongside the keys
+    # index: track the position of each (hashable) item for decrease_key
+    def __init__(self, arr=None, order='max', items=None, index=False):
+        if order not in ('max', 'min'):
+            raise ValueError(f'Unknown order {order!r}')
         # Specify array as A
-        self.A = arr
+        self.A = [] if arr is None else arr
         # Get the heapsize
-        self.heapsize = len(arr)
-     
+        self.heapsize = len(self.A)
+        self.is_max = order == 'max'
+        # Payloads and their positions
+        if items is None and index: # default items are initial positions
+            items = range(self.heapsize)
+        self.items = None if items is None else list(items)
+        self.pos = None
+        if index:
+            self.pos = {item: i for i, item in enumerate(self.items)}
+
+    # Number of keys in the heap
+    def __len__(self):
+        return self.heapsize
+
     # Get left-child at node i
-    def left(self, i):
-        self.l = 2*i + 1
-    
+    @staticmethod
+    def left(i):
+        return 2*i + 1
+
     # Get right-child at node i
-    def right(self, i):
-        self.r = 2*i + 2
-    
+    @staticmethod
+    def right(i):
+        return 2*i + 2
+
+    # Get parent at node i
+    @staticmethod
+    def parent(i):
+        return (i - 1) // 2
+
     # Update heap size after 'pop'
     def update_size(self):
         self.heapsize = self.heapsize - 1
-        
-    # Get a (max)-heap with dynamic index i
-    def heapify(self, i):
-
-        # Set left-child with respect to node i
-        self.left(i)
-        # Set right-child with respect to node i
-        self.right(i)
-
-        # If left child exists and is greater than node i
-        if self.l < self.heapsize and self.A[self.l] > self.A[i]:
-            largest = self.l # left child is largest
+
+    # Move the key at node i down until the heap property holds
+    def sift_down(self, i):
+
+        # Hold the key (and item) while children move up into the hole
+        A, items, pos = self.A, self.items, self.pos
+        is_max, n = self.is_max, self.heapsize
+        key = A[i]
+        if items is not None:
+            item = items[i]
+
+        l = 2*i + 1
+        while l < n:
+            # Pick the child that belongs on top
+            r = l + 1
+            if r < n and ((A[r] > A[l]) if is_max else (A[r] < A[l])):
+                l = r
+            # Stop once the held key belongs above that child
+            if not ((A[l] > key) if is_max else (A[l] < key)):
+                break
+            # Move the child up into the hole
+            A[i] = A[l]
+            if items is not None:
+                items[i] = items[l]
+                if pos is not None:
+                    pos[items[i]] = i
+            i = l
+            l = 2*i + 1
+
+        # Place the held key (and item) in the hole
+        A[i] = key
+        if items is not None:
+            items[i] = item
+            if pos is not None:
+                pos[item] = i
+
+    # Move the key at node i up until the heap property holds
+    def sift_up(self, i):
+
+        # Hold the key (and item) while parents move down into the hole
+        A, items, pos = self.A, self.items, self.pos
+        is_max = self.is_max
+        key = A[i]
+        if items is not None:
+            item = items[i]
+
+        while i > 0:
+            p = (i - 1) // 2
+            # Stop once the parent belongs above the held key
+            if not ((key > A[p]) if is_max else (key < A[p])):
+                break
+            # Move the parent down into the hole
+            A[i] = A[p]
+            if items is not None:
+                items[i] = items[p]
+                if pos is not None:
+                    pos[items[i]] = i
+            i = p
+
+        # Place the held key (and item) in the hole
+        A[i] = key
+        if items is not None:
+            items[i] = item
+            if pos is not None:
+                pos[item] = i
+
+    # Get a heap with dynamic index i, or the whole heap if i is None
+    def heapify(self, i=None):
+        if i is None:
+            self.build_heap()
         else:
-            largest = i
-        
-        # If right child exists and is greater than node i
-        if self.r < self.heapsize and self.A[self.r] > self.A[largest]:
-            largest = self.r # right child is largest
-
-        if largest != i:
-            # Swap node i and largest value
-            self.A[i], self.A[largest] = self.A[largest], self.A[i]
-            self.heapify(largest) # recursively heapify at largest value
-    
+            self.sift_down(i)
+
     # Build a heap
     def build_heap(self):
- 
+
         for i in range(self.heapsize // 2 - 1, -1, -1):
-            self.heapify(i) # recursively heapify at node i
-    
+            self.sift_down(i) # heapify at node i
+
+    # Swap nodes i and j (keys, items and positions)
+    def swap(self, i, j):
+        A, items = self.A, self.items
+        A[i], A[j] = A[j], A[i]
+        if items is not None:
+            items[i], items[j] = items[j], items[i]
+            if self.pos is not None:
+                self.pos[items[i]] = i
+                self.pos[items[j]] = j
+
     # Execute heapsort (directly modifies A attribute)
     def heapsort(self):
+        self.partial_sort(self.heapsize)
+
+    # Stop heapsort after k extractions: the last k slots of A then hold the
+    # k largest (max-heap) or smallest (min-heap) keys in sorted order
+    def partial_sort(self, k):
         # Invoke build_heap method
         self.build_heap()
 
-        for i in range(self.heapsize - 1, 0, -1):
+        for i in range(self.heapsize - 1, max(self.heapsize - k, 0) - 1, -1):
             # Swap root and node i
-            self.A[0], self.A[i] = self.A[i], self.A[0]
+            self.swap(0, i)
             self.update_size() # subtract 1 from heapsize
-            self.heapify(0) # recursively heapify at root
-
-# Initialize failure count
-failures = 0
-# Iterate through 100 different random arrays
-for j in range(1, 100):
-    # Generate random test array
-    test_array = np.random.randint(-999, 999, size=2000)
-    # Instantiate an arbitrary heap
-    test_heap = Heap(test_array)
-    # Sort the test heap with heapsort
-    test_heap.heapsort()
-    
-    # Ensure heap sort returns same result as np.sort
-    if sum(test_heap.A != np.sort(test_array)):
-        print('Random testing failed!')
+            self.sift_down(0) # heapify at root
+
+    # Key (and item) at the top of the heap
+    def peek(self):
+        if self.heapsize == 0:
+            raise IndexError('peek from empty heap')
+        if self.items is None:
+            return self.A[0]
+        return self.A[0], self.items[0]
+
+    # Add a key (and item) to the heap
+    def push(self, key, item=None):
+        i = self.heapsize
+        # Reuse a slot left behind by pop, otherwise grow the list
+        if i < len(self.A):
+            self.A[i] = key
+        else:
+            self.A.append(key)
+        if self.items is not None:
+            if i < len(self.items):
+                self.items[i] = item
+            else:
+                self.items.append(item)
+            if self.pos is not None:
+                self.pos[item] = i
+        self.heapsize = i + 1
+        self.sift_up(i)
+
+    # Remove and return the key (and item) at the top of the heap
+    def pop(self):
+        top = self.peek()
+        # Move the last node to the root and restore the heap
+        last = self.heapsize - 1
+        self.swap(0, last)
+        self.update_size()
+        if last > 0:
+            self.sift_down(0)
+        # Drop the popped node from list storage
+        if self.pos is not None:
+            del self.pos[self.items[last]]
+        if isinstance(self.A, list):
+            del self.A[last:]
+            if self.items is not None:
+                del self.items[last:]
+        return top
+
+    # Pop the top and push a new key (and item) in one sift
+    def replace(self, key, item=None):
+        top = self.peek()
+        self.A[0] = key
+        if self.items is not None:
+            if self.pos is not None:
+                del self.pos[self.items[0]]
+                self.pos[item] = 0
+            self.items[0] = item
+        self.sift_down(0)
+        return top
+
+    # Change the key of a tracked item (towards the top for CLRS decrease-key
+    # on a min-heap, or in either direction) and restore the heap
+    def decrease_key(self, item, key):
+        if self.pos is None:
+            raise ValueError('decrease_key requires a heap built with index=True')
+        i = self.pos[item]
+        old = self.A[i]
+        self.A[i] = key
+        # Sift towards the top if the key moved that way, otherwise down
+        if (key > old) if self.is_max else (key < old):
+            self.sift_up(i)
+        else:
+            self.sift_down(i)
+
+# Streaming top-k: the k largest (or smallest) items of a stream with their
+# original indices, using a bounded heap of k items (O(k) memory)
+# stream: an iterable of scalars and/or NumPy chunks, indexed in order
+def top_k(stream, k, largest=True):
+
+    # Keep the k best so far with the worst of them on top
+    heap = Heap(order='min' if largest else 'max', items=[])
+    # Index of the first element of the current chunk
+    offset = 0
+
+    for chunk in stream:
+        chunk = np.atleast_1d(chunk)
+        idx = np.arange(offset, offset + len(chunk))
+        offset += len(chunk)
+        if k <= 0:
+            continue
+
+        # Drop values that cannot beat the worst of the current top k
+        if len(heap) == k:
+            worst = heap.peek()[0]
+            keep = chunk > worst if largest else chunk < worst
+            chunk, idx = chunk[keep], idx[keep]
+        # Only the chunk's own top k can make it into the heap (selected
+        # without negating, which would wrap around for unsigned dtypes)
+        if len(chunk) > k:
+            if largest:
+                part = np.argpartition(chunk, len(chunk) - k)[len(chunk) - k:]
+            else:
+                part = np.argpartition(chunk, k - 1)[:k]
+            chunk, idx = chunk[part], idx[part]
+
+        for val, i in zip(chunk.tolist(), idx.tolist()):
+            if len(heap) < k:
+                heap.push(val, i)
+            elif (val > heap.A[0]) if largest else (val < heap.A[0]):
+                heap.replace(val, i)
+
+    # Sort the k items best first
+    heap.partial_sort(len(heap))
+    vals = np.array(heap.A)
+    idx = np.array(heap.items, dtype=np.int64)
+    return vals, idx
+
+if __name__ == '__main__':
+
+    # Initialize failure count
+    failures = 0
+    # Iterate through 100 different random arrays
+    for j in range(1, 100):
+        # Generate random test array
+        test_array = np.random.randint(-999, 999, size=2000)
+        # Instantiate an arbitrary heap
+        test_heap = Heap(test_array)
+        # Sort the test heap with heapsort
+        test_heap.heapsort()
+
+        # Ensure heap sort returns same result as np.sort
+        if sum(test_heap.A != np.sort(test_array)):
+            print('Random testing failed!')
+            failures += 1
+
+    # Random priority-queue operations against a sorted list
+    test_keys = list(np.random.randint(-999, 999, size=2000))
+    test_queue = Heap(order='min', items=[], index=True)
+    for item, key in enumerate(test_keys):
+        test_queue.push(key, item)
+    # Move half of the keys, then pop everything in order
+    for item in range(0, len(test_keys), 2):
+        test_keys[item] = np.random.randint(-999, 999)
+        test_queue.decrease_key(item, test_keys[item])
+    popped = [test_queue.pop()[0] for _ in range(len(test_keys))]
+    if popped != sorted(test_keys):
+        print('Random priority queue testing failed!')
         failures += 1
-if failures == 0:
-    print('Passed all random tests!')
\ No newline at end of file
+
+    # Streaming top-k and partial sort against np.sort
+    test_array = np.random.randint(-999, 999, size=20000)
+    # Unsigned scores as well as signed ones
+    for arr in [test_array, (test_array + 999).astype(np.uint32)]:
+        for largest in [True, False]:
+            vals, idx = top_k(np.array_split(arr, 7), 100, largest)
+            expected = np.sort(arr)
+            expected = expected[::-1][:100] if largest else expected[:100]
+            if not (np.array_equal(vals, expected)
+                    and np.array_equal(arr[idx], vals)):
+                print('Random top-k testing failed!')
+                failures += 1
+    test_heap = Heap(test_array.copy())
+    test_heap.partial_sort(100)
+    if not np.array_equal(test_heap.A[-100:], np.sort(test_array)[-100:]):
+        print('Random partial sort testing failed!')
+        failures += 1
+
+    if failures == 0:
+        print('Passed all random tests!')
\ No newline at end of file
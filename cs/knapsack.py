@@ -6,10 +6,14 @@ Andrew J. Graves
 """
 
 # Import modules
+import heapq
+import os
+import time
+from multiprocessing import Pool
 import numpy as np
 
 # Greedy 0-1 knapsack solution with value-to-weight ratio heuristic
-def ks_greedy(vals, wts, cap):
+def ks_greedy(vals, wts, cap, verbose=True):
     
     # Initialize item indices and result values
     items = []
@@ -20,7 +24,7 @@ def ks_greedy(vals, wts, cap):
     best = 0
     
     # Calculate value-to-weight ratio and return indices in decreasing order
-    greedy_idx = np.argsort(-1 * np.divide(v, w)) # function of nlgn
+    greedy_idx = np.argsort(-1 * np.divide(vals, wts)) # function of nlgn
     
     # Iterate through the value-to-weight ratio indices
     # Using 'for' instead of 'while' to catch potential light values after initial overflow
@@ -42,14 +46,15 @@ def ks_greedy(vals, wts, cap):
     # Check if best single value beats set of values
     if best > value_sum:
         value_sum = best
-        items = best_idx
+        items = [best_idx]
 
-    print(f'Value sum: {value_sum}')
-    print(f'Value indices: {items}')
+    if verbose:
+        print(f'Value sum: {value_sum}')
+        print(f'Value indices: {items}')
     return value_sum, items
 
 # Dynamic programming solution to the 0-1 knapsack problem
-def ks_dyn(vals, wts, cap, large_vals=None):
+def ks_dyn(vals, wts, cap, large_vals=None, verbose=True):
     
     # Initialize item x capacity matrix
     rows = len(vals) + 1 # augment with null item
@@ -63,16 +68,19 @@ def ks_dyn(vals, wts, cap, large_vals=None):
 
     # Iterate through input items (vals / wts)
     for i in range(1, rows):
-        # Iterate through possible capacities (starting at 1)
-        for w in range(1, cols):
-
-            # If current weight candidate fits and adds value to current knapsack
-            if wts[i-1] <= w and vals[i-1] + arr[i-1, w - wts[i-1]] > arr[i-1, w]:
-                arr[i, w] = vals[i-1] + arr[i-1, w - wts[i-1]] # store the new value
-                res[i, w] = 1 # mark for item recovery later
-            else:
-                arr[i, w] = arr[i-1, w] # store the old value
-                res[i, w] = 0 # item should not be recovered
+        # Capacities (starting at 1) where the current weight candidate fits
+        start = max(wts[i-1], 1)
+        # Start from the old values
+        arr[i] = arr[i-1]
+        if start >= cols:
+            continue
+
+        # Value of adding the candidate to the previous row, shifted by its weight
+        cand = vals[i-1] + arr[i-1, start - wts[i-1]:cols - wts[i-1]]
+        # Flag the capacities where the candidate adds value to the knapsack
+        keep = cand > arr[i-1, start:]
+        arr[i, start:][keep] = cand[keep] # store the new values
+        res[i, start:] = keep # mark for item recovery later
     
     # Iterate through the flags in reverse to recover the items
     for i in range(rows-1, -1, -1):
@@ -87,48 +95,478 @@ def ks_dyn(vals, wts, cap, large_vals=None):
                 pass
                 
     # Return the value sum and the value indices
-    if large_vals:
+    if large_vals is not None:
         value_sum = sum(final_vals)
     else:
         value_sum = int(arr[rows-1, cols-1])
-    print(f'Value sum: {value_sum}')
-    print(f'Value indices: {items}')
+    if verbose:
+        print(f'Value sum: {value_sum}')
+        print(f'Value indices: {items}')
+    return value_sum, items
+
+# Best value at each capacity 0..cap for a subset of items (one rolling row)
+def ks_row(vals, wts, cap, dtype, keep_bits=None):
+
+    # Initialize the value row over capacities
+    row = np.zeros(cap + 1, dtype=dtype)
+
+    # Iterate through input items (vals / wts)
+    for i in range(len(vals)):
+        # Skip items that do not fit at any capacity
+        wt = wts[i]
+        if wt > cap:
+            continue
+        # Value of adding the item to the best knapsack with room for it
+        cand = row[:cap + 1 - wt] + vals[i]
+        # Flag the capacities where the item adds value
+        keep = cand > row[wt:]
+        row[wt:][keep] = cand[keep]
+
+        # Store the flags as bits for item recovery later
+        if keep_bits is not None:
+            flags = np.zeros(cap + 1, dtype=bool)
+            flags[wt:] = keep
+            keep_bits[i] = np.packbits(flags)
+
+    return row
+
+# Divide-and-conquer (Hirschberg-style) item recovery in O(cap) memory
+def ks_hirschberg(vals, wts, cap, dtype, idx):
+
+    # Base cases: no items, or a single item that either fits or not
+    if len(idx) == 0:
+        return []
+    if len(idx) == 1:
+        i = idx[0]
+        return [i] if wts[i] <= cap and vals[i] > 0 else []
+
+    # Best values of each half of the items at every capacity
+    mid = len(idx) // 2
+    first = ks_row(vals[idx[:mid]], wts[idx[:mid]], cap, dtype)
+    second = ks_row(vals[idx[mid:]], wts[idx[mid:]], cap, dtype)
+
+    # Split the capacity where the two halves combine best
+    split = int(np.argmax(first + second[::-1]))
+    return (ks_hirschberg(vals, wts, split, dtype, idx[:mid])
+            + ks_hirschberg(vals, wts, cap - split, dtype, idx[mid:]))
+
+# Rolling-array dynamic programming solution to the 0-1 knapsack problem
+# Keeps one value row; recovers items from a bit-packed keep matrix or,
+# if that would exceed max_bytes, by divide and conquer
+def ks_rolling(vals, wts, cap, large_vals=None, recovery='auto',
+               max_bytes=2**30, verbose=True):
+
+    # Use an integer row whenever all values are integers
+    vals = np.asarray(vals)
+    wts = np.asarray(wts, dtype=np.int64)
+    if np.all(np.mod(vals, 1) == 0):
+        vals = vals.astype(np.int64)
+    n = len(vals)
+
+    # Pick the recovery method that fits in memory
+    if recovery == 'auto':
+        bits_bytes = n * ((cap + 8) // 8)
+        recovery = 'bits' if bits_bytes <= max_bytes else 'hirschberg'
+
+    if recovery == 'bits':
+        # One bit per (item, capacity) flag
+        keep_bits = np.zeros([n, (cap + 8) // 8], dtype=np.uint8)
+        row = ks_row(vals, wts, cap, vals.dtype, keep_bits)
+
+        # Iterate through the flags in reverse to recover the items
+        items = []
+        w = cap
+        for i in range(n-1, -1, -1):
+            # Decrement capacity by weights at flag indices
+            if (keep_bits[i, w >> 3] >> (7 - (w & 7))) & 1:
+                items.append(i)
+                w -= wts[i]
+        value_sum = row[cap]
+    elif recovery == 'hirschberg':
+        items = ks_hirschberg(vals, wts, cap, vals.dtype, np.arange(n))
+        items = sorted(items, reverse=True)
+        value_sum = np.sum(vals[items])
+    else:
+        raise ValueError(f'Unknown recovery {recovery!r}')
+
+    # Return the value sum and the value indices
+    if large_vals is not None:
+        value_sum = sum(large_vals[i] for i in items)
+    value_sum = value_sum.item() if hasattr(value_sum, 'item') else value_sum
+    items = [int(i) for i in items]
+    if verbose:
+        print(f'Value sum: {value_sum}')
+        print(f'Value indices: {items}')
     return value_sum, items
 
+# Best-first branch-and-bound solution to the 0-1 knapsack problem
+# Bounds come from the fractional relaxation over items sorted by
+# value-to-weight ratio; stops early at node_limit nodes or time_limit seconds
+def ks_bnb(vals, wts, cap, node_limit=None, time_limit=None, return_gap=False,
+           verbose=True):
+
+    # Only consider items that fit on their own
+    vals = np.asarray(vals)
+    wts = np.asarray(wts)
+    fit = np.flatnonzero(wts <= cap)
+    # Calculate value-to-weight ratio and sort indices in decreasing order
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where(wts[fit] > 0, vals[fit] / wts[fit], np.inf)
+    order = fit[np.argsort(-ratio, kind='stable')]
+    v_s, w_s = vals[order], wts[order]
+    m = len(order)
+
+    # Prefix sums for O(log n) bounds
+    cum_v = np.concatenate(([0], np.cumsum(v_s)))
+    cum_w = np.concatenate(([0], np.cumsum(w_s)))
+
+    # Greedy fill from item level on: (last item that fits whole, bound)
+    def bound(level, value, weight):
+        room = cap - weight
+        k = np.searchsorted(cum_w, cum_w[level] + room, 'right') - 1
+        ub = value + cum_v[k] - cum_v[level]
+        # Add the fraction of the first item that does not fit
+        if k < m:
+            ub += (room - (cum_w[k] - cum_w[level])) * v_s[k] / w_s[k]
+        return k, ub
+
+    # Initialize the incumbent with the greedy fill of the root
+    k, ub = bound(0, 0, 0)
+    best = cum_v[k]
+    best_taken, best_level, best_k = None, 0, k
+
+    # Best-first frontier of (-bound, tie-breaker, level, value, weight, taken)
+    # where taken is a linked list of (sorted item index, parent list)
+    frontier = [(-ub, 0, 0, 0, 0, None)]
+    counter = 1
+    nodes = 0
+    start = time.perf_counter()
+
+    while frontier:
+        # Best-first: stop once no node can beat the incumbent
+        if -frontier[0][0] <= best:
+            frontier = []
+            break
+        # Stop early if a limit was reached
+        if ((node_limit is not None and nodes >= node_limit) or
+                (time_limit is not None
+                 and time.perf_counter() - start >= time_limit)):
+            break
+
+        _, _, level, value, weight, taken = heapq.heappop(frontier)
+        nodes += 1
+
+        # Branch on including or excluding the item at this level
+        children = [(level + 1, value, weight, taken)]
+        if weight + w_s[level] <= cap:
+            children.append((level + 1, value + v_s[level],
+                             weight + w_s[level], (level, taken)))
+        for c_level, c_value, c_weight, c_taken in children:
+            k, ub = bound(c_level, c_value, c_weight)
+            # The greedy fill of the child is a feasible solution
+            fill = c_value + cum_v[k] - cum_v[c_level]
+            if fill > best:
+                best = fill
+                best_taken, best_level, best_k = c_taken, c_level, k
+            # Keep the child if its bound can beat the incumbent
+            if ub > best and c_level < m:
+                heapq.heappush(frontier, (-ub, counter, c_level, c_value,
+                                          c_weight, c_taken))
+                counter += 1
+
+    # Proven optimality gap between the best bound left and the incumbent
+    gap = max(-frontier[0][0] - best, 0) if frontier else 0
+
+    # Recover the items from the incumbent's branch and its greedy fill
+    items = list(range(best_level, best_k))
+    while best_taken is not None:
+        items.append(best_taken[0])
+        best_taken = best_taken[1]
+    items = sorted((int(order[i]) for i in items), reverse=True)
+
+    # Return the value sum and the value indices
+    value_sum = np.sum(vals[items]).item() if items else 0
+    if verbose:
+        print(f'Value sum: {value_sum}')
+        print(f'Value indices: {items}')
+        print(f'Optimality gap: {gap}')
+    if return_gap:
+        return value_sum, items, gap
+    return value_sum, items
+
+# Minimum weight that reaches each profit 0..total exactly (inf if
+# unreachable) for a subset of items (one rolling row)
+def ks_profit_row(profits, wts, cap, total, keep_bits=None):
+
+    min_wt = np.full(total + 1, np.inf)
+    min_wt[0] = 0
+
+    # Iterate through input items (profits / wts)
+    for i in range(len(profits)):
+        p = profits[i]
+        if wts[i] > cap or p <= 0 or p > total:
+            continue
+        # Weight of reaching each profit by adding the item
+        cand = min_wt[:total + 1 - p] + wts[i]
+        # Flag the profits the item reaches more lightly
+        keep = cand < min_wt[p:]
+        min_wt[p:][keep] = cand[keep]
+
+        # Store the flags as bits for item recovery later
+        if keep_bits is not None:
+            flags = np.zeros(total + 1, dtype=bool)
+            flags[p:] = keep
+            keep_bits[i] = np.packbits(flags)
+
+    return min_wt
+
+# Divide-and-conquer recovery of a lightest item set with profit exactly q
+def ks_profit_hirschberg(profits, wts, cap, q, idx):
+
+    # Base cases: no profit left, or a single item that makes up q
+    if q == 0 or len(idx) == 0:
+        return []
+    if len(idx) == 1:
+        return [idx[0]]
+
+    # Lightest weights of each half of the items at every profit up to q
+    mid = len(idx) // 2
+    first = ks_profit_row(profits[idx[:mid]], wts[idx[:mid]], cap, q)
+    second = ks_profit_row(profits[idx[mid:]], wts[idx[mid:]], cap, q)
+
+    # Split the profit where the two halves combine most lightly
+    split = int(np.argmin(first + second[::-1]))
+    return (ks_profit_hirschberg(profits, wts, cap, split, idx[:mid])
+            + ks_profit_hirschberg(profits, wts, cap, q - split, idx[mid:]))
+
+# Min-weight-per-profit dynamic programming over integer (scaled) profits
+# Table width is bounded by the profit of the fractional relaxation, not cap;
+# items are recovered from a bit-packed keep matrix or, if that would exceed
+# max_bytes, by divide and conquer
+def ks_profit(profits, wts, cap, recovery='auto', max_bytes=2**30):
+
+    profits = np.asarray(profits, dtype=np.int64)
+    wts = np.asarray(wts)
+    n = len(profits)
+
+    # Bound the total profit with the fractional relaxation
+    fit = np.flatnonzero(wts <= cap)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where(wts[fit] > 0, profits[fit] / wts[fit], np.inf)
+    order = fit[np.argsort(-ratio, kind='stable')]
+    cum_w = np.cumsum(wts[order])
+    k = np.searchsorted(cum_w, cap, 'right')
+    total = np.sum(profits[order[:k]])
+    if k < len(order):
+        room = cap - (cum_w[k-1] if k > 0 else 0)
+        total += room * profits[order[k]] // wts[order[k]]
+    total = int(total)
+
+    # Pick the recovery method that fits in memory
+    if recovery == 'auto':
+        bits_bytes = n * ((total + 8) // 8)
+        recovery = 'bits' if bits_bytes <= max_bytes else 'hirschberg'
+
+    if recovery == 'bits':
+        # One bit per (item, profit) flag
+        keep_bits = np.zeros([n, (total + 8) // 8], dtype=np.uint8)
+        min_wt = ks_profit_row(profits, wts, cap, total, keep_bits)
+        # Largest profit that fits in the knapsack
+        q = int(np.flatnonzero(min_wt <= cap)[-1])
+
+        # Iterate through the flags in reverse to recover the items
+        items = []
+        for i in range(n-1, -1, -1):
+            if (keep_bits[i, q >> 3] >> (7 - (q & 7))) & 1:
+                items.append(i)
+                q -= profits[i]
+    elif recovery == 'hirschberg':
+        min_wt = ks_profit_row(profits, wts, cap, total)
+        q = int(np.flatnonzero(min_wt <= cap)[-1])
+        # Only items the DP can use take part in the recovery
+        usable = np.flatnonzero((wts <= cap) & (profits > 0) &
+                                (profits <= total))
+        items = sorted(ks_profit_hirschberg(profits, wts, cap, q, usable),
+                       reverse=True)
+    else:
+        raise ValueError(f'Unknown recovery {recovery!r}')
+    return [int(i) for i in items]
+
 # Approximation with shrinkage parameter epsilon
-def ks_approx(vals, wts, cap, eps=.5):
-    
-    # Initialize small values
-    small_vals = []
+# method='capacity' runs ks_dyn on the scaled values (table width cap + 1);
+# method='profit' is an FPTAS that scales by a 2-approximation of the optimum,
+# so its DP runs over O(n / eps) scaled profits in O(n^2 / eps) time,
+# independent of cap (max_bytes bounds its item-recovery matrix)
+def ks_approx(vals, wts, cap, eps=.5, method='capacity', max_bytes=2**30,
+              verbose=True):
+
+    if method == 'profit':
+        # Lower bound within a factor 2 of the optimum: the better of the
+        # greedy fill and the best single item that fits
+        with np.errstate(divide='ignore', invalid='ignore'):
+            lower = ks_greedy(vals, wts, cap, verbose=False)[0]
+        if lower <= 0:
+            items = []
+        else:
+            # Compute delta to scale down the values (the scaled optimum is
+            # then at most 2n / eps)
+            delta = (eps * lower) / len(vals)
+            # Convert to integer and scale down values
+            small_vals = np.floor(np.asarray(vals) / delta)
+            # Run the profit-space dynamic programming routine
+            items = ks_profit(small_vals, wts, cap, max_bytes=max_bytes)
+
+        # Return the value sum and the value indices
+        value_sum = sum(vals[i] for i in items)
+        if verbose:
+            print(f'Value sum: {value_sum}')
+            print(f'Value indices: {items}')
+        return value_sum, items
+    elif method != 'capacity':
+        raise ValueError(f'Unknown method {method!r}')
+
+    # Nothing to scale without a positive value (e.g., an empty instance)
+    if len(vals) == 0 or max(vals) <= 0:
+        return ks_dyn([], [], cap, [], verbose)
+
     # Compute delta to scale down the values
     delta = (eps * max(vals)) / len(vals)
-    
-    for i in range(len(vals)):
-        # Convert to integer and scale down values
-        small_vals.append(np.floor(vals[i] / delta))
-    
+    # Convert to integer and scale down values
+    small_vals = np.floor(np.asarray(vals) / delta)
+
     # Run the dynamic programming routine with scaled down values
-    return ks_dyn(small_vals, wts, cap, vals)
+    return ks_dyn(list(small_vals), wts, cap, vals, verbose)
+
+# Solve a chunk of (vals, wts, cap) instances quietly (process pool task)
+def ks_solve_chunk(args):
+
+    solver, chunk, kwargs = args
+    solve = KS_SOLVERS[solver]
+    results = []
+    for vals, wts, cap in chunk:
+        value_sum, items = solve(vals, wts, cap, verbose=False, **kwargs)[:2]
+        results.append((value_sum, np.asarray(items, dtype=np.int64)))
+    return results
+
+# Solve many independent knapsack instances across a process pool
+# instances: list of (vals, wts, cap); solver: a key of KS_SOLVERS
+# Returns value sums, a flat array of item indices and its offsets per instance
+def ks_batch(instances, solver='dyn', num_workers=None, chunksize=None,
+             **kwargs):
+
+    # Initialization
+    num_workers = num_workers or os.cpu_count() # size of the process pool
+    n = len(instances)
+    if chunksize is None:
+        chunksize = max(1, n // (4 * num_workers))
+    chunks = [(solver, instances[i:i + chunksize], kwargs)
+              for i in range(0, n, chunksize)]
+
+    # Solve in this process when there is nothing to parallelize
+    if num_workers == 1 or len(chunks) <= 1:
+        results = [ks_solve_chunk(chunk) for chunk in chunks]
+    else:
+        with Pool(num_workers) as pool:
+            results = pool.map(ks_solve_chunk, chunks)
+
+    # Pack the results into arrays
+    results = [res for chunk in results for res in chunk]
+    value_sums = np.array([res[0] for res in results])
+    item_counts = [len(res[1]) for res in results]
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(item_counts, out=offsets[1:])
+    items = (np.concatenate([res[1] for res in results]) if n
+             else np.zeros(0, dtype=np.int64))
+    return value_sums, items, offsets
+
+# Batch solve instances given as ragged arrays
+# (vals and wts of instance j are vals[offsets[j]:offsets[j+1]])
+def ks_batch_ragged(vals, wts, offsets, caps, **kwargs):
+
+    instances = [(vals[offsets[j]:offsets[j+1]], wts[offsets[j]:offsets[j+1]],
+                  int(caps[j])) for j in range(len(caps))]
+    return ks_batch(instances, **kwargs)
+
+# Compare serial and parallel batch throughput on random instances
+def ks_batch_bench(num_instances=2000, num_items=30, max_cap=200,
+                   solver='dyn', num_workers=None, seed=0):
+
+    # Generate random instances
+    rng = np.random.default_rng(seed)
+    instances = [(list(rng.integers(1, 100, num_items)),
+                  list(rng.integers(1, max_cap // 2, num_items)),
+                  int(rng.integers(1, max_cap)))
+                 for _ in range(num_instances)]
+
+    # Time the serial and parallel runs
+    times = {}
+    for label, workers in [('serial', 1), ('parallel', num_workers)]:
+        start = time.perf_counter()
+        res = ks_batch(instances, solver, workers)
+        times[label] = time.perf_counter() - start
+        print(f'{label}: {num_instances / times[label]:.0f} instances/s')
+
+    # Both runs must find the same value sums
+    assert np.array_equal(ks_batch(instances, solver, 1)[0], res[0])
+    return times
+
+# Solvers available to the batch API
+KS_SOLVERS = {'greedy': ks_greedy, 'dyn': ks_dyn, 'rolling': ks_rolling,
+              'bnb': ks_bnb, 'approx': ks_approx}
+
+if __name__ == '__main__':
+
+    # Simple test of the greedy algorithm
+    v = [1, 4, 3, 5, 100] 
+    w = [5, 4, 6, 3, 40] 
+    c = 10
+
+    greedy_res = ks_greedy(v, w, c)
+
+    # Tests for approximation and DP
+    v = [12, 1, 6, 2, 10] 
+    w = [1, 2, 3, 1, 10] 
+    c = 10
+
+    # No worse than .1 * 21
+    print('Least optimal (large epsilon)\n---')
+    ks_approx(v, w, c, eps=.9)
+
+    # No worse than .5 * 21
+    print('\nApproximately optimal (medium epsilon)\n---')
+    ks_approx(v, w, c, eps=.5)
+
+    # Same guarantees, with the DP over scaled profits instead of capacity
+    print('\nApproximately optimal (profit-space FPTAS)\n---')
+    ks_approx(v, w, c, eps=.5, method='profit')
 
-# Simple test of the greedy algorithm
-v = [1, 4, 3, 5, 100] 
-w = [5, 4, 6, 3, 40] 
-c = 10
+    print('\nOptimal\n---')
+    opt_res = ks_dyn(v, w, c)
 
-greedy_res = ks_greedy(v, w, c)
+    print('\nOptimal (rolling array)\n---')
+    rolling_res = ks_rolling(v, w, c)
 
-# Tests for approximation and DP
-v = [12, 1, 6, 2, 10] 
-w = [1, 2, 3, 1, 10] 
-c = 10
+    print('\nOptimal (rolling array, divide-and-conquer recovery)\n---')
+    hirschberg_res = ks_rolling(v, w, c, recovery='hirschberg')
 
-# No worse than .1 * 21
-print('Least optimal (large epsilon)\n---')
-ks_approx(v, w, c, eps=.9)
+    print('\nOptimal (branch and bound)\n---')
+    bnb_res = ks_bnb(v, w, c)
 
-# No worse than .5 * 21
-print('\nApproximately optimal (medium epsilon)\n---')
-ks_approx(v, w, c, eps=.5)
+    # Every solver through the ragged batch API (NumPy slices as inputs)
+    rng = np.random.default_rng(0)
+    ragged_offsets = np.array([0, 5, 5, 12, 20, 30])
+    ragged_vals = rng.integers(1, 100, ragged_offsets[-1])
+    ragged_wts = rng.integers(1, 30, ragged_offsets[-1])
+    ragged_caps = rng.integers(1, 60, len(ragged_offsets) - 1)
+    exact = ks_batch_ragged(ragged_vals, ragged_wts, ragged_offsets,
+                            ragged_caps, solver='dyn', num_workers=1)[0]
+    print('\nRagged batch value sums\n---')
+    for solver in KS_SOLVERS:
+        value_sums = ks_batch_ragged(ragged_vals, ragged_wts, ragged_offsets,
+                                     ragged_caps, solver=solver,
+                                     num_workers=1)[0]
+        print(f'{solver}: {value_sums} (optimal: {exact})')
 
-print('\nOptimal\n---')
-opt_res = ks_dyn(v, w, c)
\ No newline at end of file
+    # Serial vs parallel throughput of the batch API
+    print('\nBatch throughput (dynamic programming)\n---')
+    ks_batch_bench(num_instances=500)
\ No newline at end of file
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+Mergeable streaming quantile sketch (KLL)
+Andrew J. Graves
+10/18/26
+"""
+
+# Import modules
+import numpy as np
+from rand_selection import rand_select
+
+# KLL sketch: a stack of compactors where an item at level h stands for 2^h
+# items of the stream. Compacting a full level sorts it and promotes every
+# other item (random offset) to the next level, so memory stays O(k) while
+# the rank error stays around eps = 1.7 / k with high probability
+class KLLSketch:
+
+    # Shrink factor of the compactor capacities below the top level
+    c = 2 / 3
+
+    # Constructor for KLLSketch class
+    # k: capacity of the top compactor (or give the rank error eps instead)
+    def __init__(self, k=200, eps=None, seed=None):
+        if eps is not None:
+            k = int(np.ceil(1.7 / eps))
+        self.k = max(int(k), 2)
+        self.levels = [np.zeros(0)]
+        self.n = 0 # number of items seen
+        self.rng = np.random.default_rng(seed)
+
+    # Capacity of the compactor at level h
+    def capacity(self, h):
+        depth = len(self.levels) - 1 - h
+        return max(int(np.ceil(self.k * self.c**depth)), 2)
+
+    # Number of stored items
+    def size(self):
+        return sum(len(level) for level in self.levels)
+
+    # Add one value
+    def update(self, x):
+        self.update_many([x])
+
+    # Add a batch of values (e.g., a NumPy chunk of the stream)
+    def update_many(self, values):
+        values = np.asarray(values, dtype=float).ravel()
+        self.n += len(values)
+        self.levels[0] = np.concatenate((self.levels[0], values))
+        self.compress()
+
+    # Merge another sketch (e.g., from another worker) into this one
+    def merge(self, other):
+        for h, level in enumerate(other.levels):
+            if h == len(self.levels):
+                self.levels.append(np.zeros(0))
+            self.levels[h] = np.concatenate((self.levels[h], level))
+        self.n += other.n
+        self.compress()
+
+    # Compact levels until the sketch fits its total capacity
+    def compress(self):
+        while self.size() > sum(self.capacity(h)
+                                for h in range(len(self.levels))):
+            # Compact the lowest level that is over capacity
+            for h in range(len(self.levels)):
+                if len(self.levels[h]) >= self.capacity(h):
+                    break
+            if h + 1 == len(self.levels):
+                self.levels.append(np.zeros(0))
+
+            # Promote every other sorted item (an odd one out stays behind)
+            level = np.sort(self.levels[h])
+            m = len(level) - len(level) % 2
+            offset = self.rng.integers(2)
+            self.levels[h+1] = np.concatenate((self.levels[h+1],
+                                               level[offset:m:2]))
+            self.levels[h] = level[m:]
+
+    # Stored items in sorted order with their cumulative weights
+    def cdf(self):
+        vals = np.concatenate(self.levels)
+        wts = np.concatenate([np.full(len(level), 2.0**h)
+                              for h, level in enumerate(self.levels)])
+        order = np.argsort(vals, kind='stable')
+        return vals[order], np.cumsum(wts[order])
+
+    # Estimate the q-th quantile(s), q in [0, 1]
+    def quantile(self, q):
+        if self.n == 0:
+            raise ValueError('quantile of an empty sketch')
+        vals, cum = self.cdf()
+        # First item whose cumulative weight reaches q of the total weight
+        idx = np.searchsorted(cum, np.asarray(q) * cum[-1], 'left')
+        return vals[np.minimum(idx, len(vals) - 1)]
+
+    # Estimate the fraction of the stream that is <= x
+    def rank(self, x):
+        vals, cum = self.cdf()
+        idx = np.searchsorted(vals, x, 'right')
+        return np.where(idx > 0, cum[np.maximum(idx - 1, 0)], 0) / cum[-1]
+
+# Compare sketch quantiles (built from chunks on simulated workers and then
+# merged) against exact selection with rand_select
+def validate_sketch(n=20000, k=200, num_workers=4, chunk_size=1000,
+                    qs=(.01, .1, .5, .9, .99, .999), seed=0):
+
+    # Generate a skewed test stream
+    rng = np.random.default_rng(seed)
+    data = rng.lognormal(size=n)
+
+    # Each worker sketches its share of the chunks, then the sketches merge
+    sketches = [KLLSketch(k, seed=seed + w) for w in range(num_workers)]
+    for j, start in enumerate(range(0, n, chunk_size)):
+        sketches[j % num_workers].update_many(data[start:start + chunk_size])
+    sketch = sketches[0]
+    for other in sketches[1:]:
+        sketch.merge(other)
+
+    # Worst normalized rank error over the requested quantiles
+    max_err = 0
+    for q in qs:
+        est = sketch.quantile(q)
+        rank = max(int(np.ceil(q * n)), 1)
+        exact = rand_select(data.copy(), 0, n - 1, rank)
+        err = abs(np.count_nonzero(data <= est) - rank) / n
+        max_err = max(max_err, err)
+        print(f'q={q}: sketch {est:.4f}, exact {exact:.4f}, rank error {err:.4f}')
+    print(f'Stored {sketch.size()} of {n} items')
+    return max_err
+
+if __name__ == '__main__':
+
+    # Rank error should stay within a small multiple of 1.7 / k
+    failures = 0
+    for k in [50, 200]:
+        if validate_sketch(k=k, seed=k) > 3 * 1.7 / k:
+            print('Random testing failed!')
+            failures += 1
+    if failures == 0:
+        print('Passed all random tests!')
\ No newline at end of file
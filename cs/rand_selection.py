@@ -71,20 +71,187 @@ def rand_select(A, p, r, i):
         # Recurisvely select later portion of array
         return rand_select(A, q+1, r, i - k)
     
-# Generate random test array
-test_array = np.random.randint(-10, 10, size=2000)
-
-# Specify starting value (counting from 1)
-start = 1
-# Specify ending value (bounded by list length)
-stop = len(test_array)
-
-failures = 0
-# Iterate over all j-th orders for this arbitrary test array
-for j in range(1, len(test_array)):
-    # Ensure random selection returns same result as indexing on a sorted array
-    if not rand_select(test_array, start-1, stop-1, j) == np.sort(test_array)[j-1]:
+# Three-way (Dutch national flag) partition of A[p..r] around the value x
+# Returns (lt, gt) with A[p:lt] < x, A[lt:gt+1] == x and A[gt+1:r+1] > x
+def part3(A, p, r, x):
+
+    # Vectorized partition for NumPy arrays
+    if isinstance(A, np.ndarray):
+        seg = A[p:r+1]
+        less, more = seg < x, seg > x
+        lt = p + np.count_nonzero(less)
+        gt = r - np.count_nonzero(more)
+        seg[:] = np.concatenate((seg[less], seg[~(less | more)], seg[more]))
+        return lt, gt
+
+    # Set lt, i to the beginning and gt to the end of the partition range
+    lt, i, gt = p, p, r
+    while i <= gt:
+        # Move values less than the pivot to the front
+        if A[i] < x:
+            A[lt], A[i] = A[i], A[lt]
+            lt += 1
+            i += 1
+        # Move values greater than the pivot to the back
+        elif A[i] > x:
+            A[i], A[gt] = A[gt], A[i]
+            gt -= 1
+        # Leave values equal to the pivot in the middle
+        else:
+            i += 1
+    return lt, gt
+
+# Median-of-medians pivot value of A[p..r] (guarantees a 30/70 split)
+def mom_pivot(A, p, r):
+
+    # Handles small ranges directly
+    n = r - p + 1
+    if n <= 5:
+        return sorted(A[p:r+1])[(n - 1) // 2]
+
+    # Medians of the groups of 5 (and of the leftover group)
+    if isinstance(A, np.ndarray):
+        m = n - n % 5
+        medians = np.sort(A[p:p+m].reshape(-1, 5), axis=1)[:, 2]
+        if m < n:
+            medians = np.append(medians, mom_pivot(A, p+m, r))
+    else:
+        medians = [sorted(A[j:min(j+5, r+1)])[(min(5, r+1-j) - 1) // 2]
+                   for j in range(p, r+1, 5)]
+
+    # Select the median of the medians
+    return intro_select(medians, 0, len(medians) - 1, (len(medians) + 1) // 2)
+
+# Iterative selection with three-way partitioning (introselect)
+# Uses random pivots, and median-of-medians pivots whenever two partitions
+# in a row keep more than 3/4 of the range, so it is O(n) in the worst case
+def intro_select(A, p, r, i):
+
+    # Handles when i too small or too large
+    if i < 1 or i > r - p + 1:
+        print(f'{i} is out of bounds. Please select another j-th order statistic.')
+        return
+    # Handles when p / r is too small / large
+    if p < 0 or r > len(A) - 1 or p > r:
+        print('Selection region is out of bounds for the input array')
+        return
+
+    # Count of partitions in a row that made little progress
+    stalls = 0
+    while p < r:
+        n = r - p + 1
+        # Pick a random pivot unless progress has stalled
+        if stalls >= 2:
+            x = mom_pivot(A, p, r)
+            stalls = 0
+        else:
+            x = A[randrange(p, r + 1)]
+
+        # Partition into < pivot, == pivot and > pivot
+        lt, gt = part3(A, p, r, x)
+        if i <= lt - p:
+            # Select from the earlier portion of the array
+            r = lt - 1
+        elif i <= gt - p + 1:
+            # Select result (the ith order statistic equals the pivot)
+            return x
+        else:
+            # Select from the later portion of the array
+            i -= gt - p + 1
+            p = gt + 1
+
+        # Update the stall count
+        stalls = stalls + 1 if r - p + 1 > 3 * n / 4 else 0
+
+    return A[p]
+
+# Select several order statistics (1-based ranks) of A at once
+# Only segments that still contain a requested rank are partitioned further,
+# so k ranks cost O(n log k) instead of k separate selections
+def multi_select(A, ranks):
+
+    # Handles ranks that are too small or too large
+    ranks = np.asarray(ranks, dtype=np.int64).ravel()
+    if np.any(ranks < 1) or np.any(ranks > len(A)):
+        print('Some ranks are out of bounds. Please select other order statistics.')
+        return
+    out = [None] * len(ranks)
+
+    # Segments still to partition: (p, r, sorted ranks, output positions, stalls)
+    order = np.argsort(ranks, kind='stable')
+    stack = [(0, len(A) - 1, ranks[order], order, 0)] if len(ranks) else []
+    while stack:
+        p, r, seg_ranks, pos, stalls = stack.pop()
+
+        # A single rank left in the segment is a plain selection
+        if seg_ranks[0] == seg_ranks[-1]:
+            x = intro_select(A, p, r, seg_ranks[0] - p)
+            for j in pos:
+                out[j] = x
+            continue
+
+        # Pick a random pivot unless progress has stalled
+        n = r - p + 1
+        if stalls >= 2:
+            x = mom_pivot(A, p, r)
+            stalls = 0
+        else:
+            x = A[randrange(p, r + 1)]
+
+        # Partition into < pivot, == pivot and > pivot
+        lt, gt = part3(A, p, r, x)
+        # Ranks that fall on the pivot are done
+        lo = np.searchsorted(seg_ranks, lt, 'right')
+        hi = np.searchsorted(seg_ranks, gt + 1, 'right')
+        for j in pos[lo:hi]:
+            out[j] = x
+
+        # Keep partitioning the segments that still hold requested ranks
+        for (q, s), rk, ps in (((p, lt - 1), seg_ranks[:lo], pos[:lo]),
+                               ((gt + 1, r), seg_ranks[hi:], pos[hi:])):
+            if len(rk):
+                stall = stalls + 1 if s - q + 1 > 3 * n / 4 else 0
+                stack.append((q, s, rk, ps, stall))
+
+    return np.array(out) if isinstance(A, np.ndarray) else out
+
+if __name__ == '__main__':
+
+    # Generate random test array
+    test_array = np.random.randint(-10, 10, size=2000)
+
+    # Specify starting value (counting from 1)
+    start = 1
+    # Specify ending value (bounded by list length)
+    stop = len(test_array)
+
+    failures = 0
+    # Sort once for the expected order statistics
+    sorted_array = np.sort(test_array)
+    # Iterate over all j-th orders for this arbitrary test array
+    for j in range(1, len(test_array)):
+        # Ensure random selection returns same result as indexing on a sorted array
+        if not rand_select(test_array, start-1, stop-1, j) == sorted_array[j-1]:
+            print('Random testing failed!')
+            failures += 1
+        # Ensure introselect returns the same result on both arrays and lists
+        if not (intro_select(test_array, start-1, stop-1, j) ==
+                intro_select(list(test_array), start-1, stop-1, j) ==
+                sorted_array[j-1]):
+            print('Random testing failed!')
+            failures += 1
+
+    # Ensure multi-selection returns every order statistic in one call
+    all_ranks = np.random.permutation(np.arange(1, stop + 1))
+    if not np.array_equal(multi_select(test_array, all_ranks),
+                          sorted_array[all_ranks - 1]):
+        print('Random testing failed!')
+        failures += 1
+    # Percentile dashboard: p50 / p90 / p99 / p999 (repeated ranks allowed)
+    pct_ranks = [1000, 1800, 1980, 1998, 1998]
+    if (multi_select(list(test_array), pct_ranks)
+            != list(sorted_array[np.array(pct_ranks) - 1])):
         print('Random testing failed!')
         failures += 1
-if failures == 0:
-    print('Passed all random tests!')
\ No newline at end of file
+    if failures == 0:
+        print('Passed all random tests!')
\ No newline at end of file
@@ -8,6 +8,8 @@ Andrew J. Graves
 # Import modules
 import sys
 import os
+import time
+import numpy as np
 
 # Linear search algorithm w/ sentinel value = -1
 def lin_search(target, item_list):
@@ -52,20 +54,154 @@ def bin_search(target, item_list, is_sorted=False):
     return False
 
 
-# Linear search example list
-lin_test_list = ['lion', 'tiger', 'elephant', 'zebra', 'bear']
+# Sorted index over item_list: sorts once, keeps the original positions, and
+# answers single or batched (vectorized) queries
+class SortedIndex:
 
-# Example test
-for i in ['tiger', 'zebra', 'panda']:
-    if lin_search(i, lin_test_list) != -1:
-        print(f'{i} is at index {lin_search(i, lin_test_list)}')
-    else:
-        print(f'{i} was not found. Returned {lin_search(i, lin_test_list)}')
+    # Constructor for SortedIndex class
+    def __init__(self, item_list):
+        arr = np.asarray(item_list)
+        # Original positions in sorted order (stable, so ties keep list order)
+        self.perm = np.argsort(arr, kind='stable')
+        # Sorted keys
+        self.keys = arr[self.perm]
+
+    # Number of indexed items
+    def __len__(self):
+        return len(self.keys)
+
+    # Sorted position of the first key >= target(s)
+    def lower_bound(self, targets):
+        return np.searchsorted(self.keys, targets, 'left')
+
+    # Sorted position of the first key > target(s)
+    def upper_bound(self, targets):
+        return np.searchsorted(self.keys, targets, 'right')
+
+    # Whether each target is in the list
+    def contains(self, targets):
+        if len(self.keys) == 0:
+            return np.zeros(np.shape(targets), dtype=bool)
+        lb = self.lower_bound(targets)
+        found = self.keys[np.minimum(lb, len(self.keys) - 1)] == targets
+        return (lb < len(self.keys)) & found
+
+    # Original index of the first match of each target (sentinel value = -1)
+    def position(self, targets):
+        if len(self.perm) == 0:
+            return np.full(np.shape(targets), -1)
+        lb = self.lower_bound(targets)
+        pos = self.perm[np.minimum(lb, len(self.perm) - 1)]
+        return np.where(self.contains(targets), pos, -1)
+
+    # Number of items in the closed range [lo, hi]
+    def count_range(self, lo, hi):
+        return np.maximum(self.upper_bound(hi) - self.lower_bound(lo), 0)
+
+
+# Hash index over item_list: maps each value to its first index, so repeated
+# lookups cost O(1) instead of a lin_search scan (sentinel value = -1)
+# Numeric NumPy arrays use a vectorized path (unique values + searchsorted)
+class HashIndex:
+
+    # Constructor for HashIndex class
+    def __init__(self, item_list):
+        self.n = len(item_list)
+        self.vectorized = (isinstance(item_list, np.ndarray) and
+                           np.issubdtype(item_list.dtype, np.number))
+        if self.vectorized:
+            # Distinct values in sorted order with their first index
+            self.keys, self.first = np.unique(item_list, return_index=True)
+        else:
+            # Keep the first index of repeated values
+            self.table = {}
+            for idx, val in enumerate(item_list):
+                self.table.setdefault(val, idx)
+
+    # Number of indexed items
+    def __len__(self):
+        return self.n
+
+    # First index of each target (sentinel value = -1); one target or many
+    def position(self, targets):
+        scalar = np.ndim(targets) == 0 and not isinstance(targets, (list, tuple))
+        if self.vectorized:
+            q = np.atleast_1d(targets)
+            pos = np.full(len(q), -1, dtype=np.int64)
+            if len(self.keys):
+                # Sorted position of each target among the distinct values
+                lb = np.minimum(np.searchsorted(self.keys, q), len(self.keys) - 1)
+                found = self.keys[lb] == q
+                pos[found] = self.first[lb[found]]
+        else:
+            q = [targets] if scalar else targets
+            pos = np.array([self.table.get(t, -1) for t in q], dtype=np.int64)
+        return int(pos[0]) if scalar else pos
+
+    # Whether each target is in the list
+    def contains(self, targets):
+        return self.position(targets) != -1
+
+# Time repeated lin_search scans against building and querying a HashIndex
+# (the scan still wins for short lists or a handful of queries)
+def bench_hash_index(sizes=(10, 100, 1000), num_queries=(1, 10, 100), seed=0):
+
+    rng = np.random.default_rng(seed)
+    for n in sizes:
+        item_list = rng.integers(0, 2 * n, n)
+        for m in num_queries:
+            # Half of the targets are hits on average
+            targets = rng.integers(0, 2 * n, m)
+
+            # One full scan per query
+            start = time.perf_counter()
+            scan = [lin_search(t, item_list) for t in targets]
+            scan_time = time.perf_counter() - start
+
+            # Build once, then answer every query in one call
+            start = time.perf_counter()
+            index = HashIndex(item_list)
+            pos = index.position(targets)
+            index_time = time.perf_counter() - start
+            assert list(pos) == scan
+
+            winner = 'lin_search' if scan_time < index_time else 'HashIndex'
+            print(f'n={n}, queries={m}: lin_search {scan_time:.2e}s, '
+                  f'HashIndex {index_time:.2e}s ({winner} faster)')
+
+
+if __name__ == '__main__':
+
+    # Linear search example list
+    lin_test_list = ['lion', 'tiger', 'elephant', 'zebra', 'bear']
+
+    # Example test (one scan per query)
+    for i in ['tiger', 'zebra', 'panda']:
+        idx = lin_search(i, lin_test_list)
+        if idx != -1:
+            print(f'{i} is at index {idx}')
+        else:
+            print(f'{i} was not found. Returned {idx}')
+
+    # Hash index example (build once, then answer all queries in one call)
+    lin_index = HashIndex(lin_test_list)
+    print(f'Indices of tiger, zebra, panda: '
+          f'{lin_index.position(["tiger", "zebra", "panda"])}')
+
+    # Binary search example list
+    bin_test_list = [3, 5, 2, 1, 8]
+
+    # Example test
+    for i in [6, 5, 1]:
+        print(f'\n----- Searching for {i} -----\n')
+        print(f'Is {i} in {bin_test_list}? {bin_search(i, bin_test_list)}')
 
-# Binary search example list
-bin_test_list = [3, 5, 2, 1, 8]
+    # Sorted index example (sort once, then answer batched queries)
+    bin_index = SortedIndex(bin_test_list)
+    print(f'\nAre [6, 5, 1] in {bin_test_list}? {bin_index.contains([6, 5, 1])}')
+    print(f'Positions of [6, 5, 1]: {bin_index.position([6, 5, 1])}')
+    print(f'Items in [2, 5]: {bin_index.count_range(2, 5)}')
 
-# Example test
-for i in [6, 5, 1]:
-    print(f'\n----- Searching for {i} -----\n')
-    print(f'Is {i} in {bin_test_list}? {bin_search(i, bin_test_list)}')
\ No newline at end of file
+    # Where does the scan still beat the hash index?
+    print()
+    bench_hash_index()
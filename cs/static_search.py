@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+"""
+Cache-friendly static search layouts (Eytzinger / block B-tree) and
+interpolation search for large sorted arrays
+Andrew J. Graves
+10/18/26
+"""
+
+# Import modules
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+
+# Largest value of a dtype (pads the unused key slots of a layout)
+def max_value(dtype):
+    if np.issubdtype(dtype, np.floating):
+        return np.inf
+    return np.iinfo(dtype).max
+
+# Static search tree over sorted keys stored in heap order
+# B = 1 gives the Eytzinger (BFS) layout; B > 1 gives a block B-tree with B
+# keys per node (B = 64 bytes / key size fills one cache line)
+class StaticSearchTree:
+
+    # Constructor for StaticSearchTree class
+    def __init__(self, item_list, B=1, is_sorted=False):
+        keys = np.asarray(item_list)
+        if not is_sorted:
+            keys = np.sort(keys)
+        n = len(keys)
+        self.n = n
+        self.B = B
+        num_nodes = max(-(-n // B), 1)
+
+        # Depth of every node (node j's children are j*(B+1) + 1 ... + B+1)
+        depth = np.zeros(num_nodes, dtype=np.int64)
+        first = 1 # first node of the next level
+        while first < num_nodes:
+            depth[first:] += 1
+            first = first * (B + 1) + 1
+        height = int(depth[-1]) + 1
+        level_start = ((B + 1)**depth - 1) // B
+
+        # In-order position of every key slot in the complete tree of this
+        # height; sorting these orders the slots of the nodes that exist
+        node = np.arange(num_nodes)
+        slot_rank = ((node - level_start)[:, None] * (B + 1)**(height - depth)[:, None]
+                     + np.arange(1, B + 1) * (B + 1)**(height - depth - 1)[:, None]
+                     - 1)
+        order = np.argsort(slot_rank.ravel(), kind='stable')
+
+        # Sorted position of every slot (n for padding slots) and its key
+        ranks = np.empty(num_nodes * B, dtype=np.int64)
+        ranks[order] = np.arange(num_nodes * B)
+        ranks = np.minimum(ranks, n)
+        tree = np.full(num_nodes * B, max_value(keys.dtype), dtype=keys.dtype)
+        tree[ranks < n] = keys[ranks[ranks < n]]
+
+        self.tree = tree.reshape(num_nodes, B)
+        self.ranks = ranks.reshape(num_nodes, B)
+
+    # Number of indexed keys
+    def __len__(self):
+        return self.n
+
+    # Number of levels in the tree
+    @property
+    def height(self):
+        num_nodes, levels, first = len(self.tree), 1, 1
+        while first < num_nodes:
+            levels += 1
+            first = first * (self.B + 1) + 1
+        return levels
+
+    # Descend the tree for all queries level by level; returns the sorted
+    # position of the first key >= each target and the (node, slot) holding it
+    def _descend(self, q):
+        B, num_nodes = self.B, len(self.tree)
+        node = np.zeros(len(q), dtype=np.int64)
+        res = np.full(len(q), self.n, dtype=np.int64)
+        res_node = np.zeros(len(q), dtype=np.int64)
+        res_slot = np.zeros(len(q), dtype=np.int64)
+        active = np.ones(len(q), dtype=bool)
+
+        for _ in range(self.height):
+            # Count keys below the target in each query's node
+            keys = self.tree[node]
+            i = np.sum(keys < q[:, None], axis=1)
+            # The first key >= target is the best candidate so far
+            hit = active & (i < B)
+            res[hit] = self.ranks[node[hit], i[hit]]
+            res_node[hit], res_slot[hit] = node[hit], i[hit]
+            # Descend to the child between the keys
+            node = node * (B + 1) + i + 1
+            active &= node < num_nodes
+            node[~active] = 0
+
+        return res, res_node, res_slot
+
+    # Sorted position of the first key >= target(s)
+    def lower_bound(self, targets):
+        res = self._descend(np.atleast_1d(np.asarray(targets)))[0]
+        return res if np.ndim(targets) else res[0]
+
+    # Whether each target is a key (the slot found by the descent matches)
+    def contains(self, targets):
+        q = np.atleast_1d(np.asarray(targets))
+        res, node, slot = self._descend(q)
+        found = (res < self.n) & (self.tree[node, slot] == q)
+        return found if np.ndim(targets) else found[0]
+
+    # Persist the layout as .npy files (path is a prefix)
+    def save(self, path):
+        np.save(path + '.tree.npy', self.tree)
+        np.save(path + '.ranks.npy', self.ranks)
+        np.save(path + '.meta.npy', np.array([self.n, self.B]))
+
+    # Load a saved layout, memory-mapping the arrays by default
+    @classmethod
+    def load(cls, path, mmap=True):
+        tree = cls.__new__(cls)
+        mode = 'r' if mmap else None
+        tree.tree = np.load(path + '.tree.npy', mmap_mode=mode)
+        tree.ranks = np.load(path + '.ranks.npy', mmap_mode=mode)
+        tree.n, tree.B = (int(x) for x in np.load(path + '.meta.npy'))
+        return tree
+
+# Batched midpoint bisection: sorted position of the first key >= target(s)
+def bisect_batch(keys, targets):
+    q = np.atleast_1d(np.asarray(targets))
+    lo = np.zeros(len(q), dtype=np.int64)
+    hi = np.full(len(q), len(keys), dtype=np.int64)
+
+    # Invariant: keys[lo-1] < target <= keys[hi]
+    while np.any(lo < hi):
+        mid = (lo + hi) // 2
+        probe = np.minimum(mid, len(keys) - 1)
+        right = (keys[probe] < q) & (lo < hi)
+        lo = np.where(right, mid + 1, lo)
+        hi = np.where(~right & (lo < hi), mid, hi)
+
+    return lo if np.ndim(targets) else lo[0]
+
+# Batched interpolation search: sorted position of the first key >= target(s)
+# Probes where a uniform spread of keys puts the target (O(log log n) probes
+# for uniform keys), and falls back to bisection after max_interp probes
+def interp_search(keys, targets, max_interp=None):
+    q = np.atleast_1d(np.asarray(targets))
+    n = len(keys)
+    if max_interp is None:
+        max_interp = 2 * int(np.ceil(np.log2(max(np.log2(max(n, 2)), 1)))) + 4
+    lo = np.zeros(len(q), dtype=np.int64)
+    hi = np.full(len(q), n, dtype=np.int64)
+    active = np.flatnonzero(lo < hi)
+    step = 0
+
+    # Invariant: keys[lo-1] < target <= keys[hi]
+    while len(active):
+        a_lo, a_hi, a_q = lo[active], hi[active], q[active]
+        if step < max_interp:
+            # Interpolate between the keys at the ends of the range
+            k_lo, k_hi = keys[a_lo], keys[a_hi - 1]
+            # Infinite keys or targets give inf - inf or inf / inf = nan;
+            # those lanes probe the low end of their range
+            with np.errstate(invalid='ignore'):
+                span = (k_hi - k_lo).astype(float)
+                frac = np.divide((a_q - k_lo).astype(float), span,
+                                 out=np.zeros(len(active)), where=span > 0)
+            frac[~np.isfinite(frac)] = 0
+            probe = a_lo + np.floor(np.clip(frac, 0, 1) * (a_hi - 1 - a_lo))
+            probe = probe.astype(np.int64)
+        else:
+            probe = (a_lo + a_hi - 1) // 2
+
+        # Narrow the range around the probe
+        right = keys[probe] < a_q
+        lo[active] = np.where(right, probe + 1, a_lo)
+        hi[active] = np.where(right, a_hi, probe)
+        active = active[lo[active] < hi[active]]
+        step += 1
+
+    return lo if np.ndim(targets) else lo[0]
+
+# Compare the layouts and interpolation search against plain bisection
+def bench_static_search(n=10**6, num_queries=10**5, dtype=np.int64, seed=0):
+
+    # Generate uniform sorted keys and random queries
+    rng = np.random.default_rng(seed)
+    keys = np.sort(rng.integers(0, 10 * n, n)).astype(dtype)
+    targets = rng.integers(0, 10 * n, num_queries).astype(dtype)
+    expected = np.searchsorted(keys, targets)
+    B = max(64 // keys.dtype.itemsize, 2)
+
+    # Build the layouts
+    eytzinger = StaticSearchTree(keys, 1, is_sorted=True)
+    btree = StaticSearchTree(keys, B, is_sorted=True)
+    methods = {'np.searchsorted': lambda: np.searchsorted(keys, targets),
+               'batched bisection': lambda: bisect_batch(keys, targets),
+               'Eytzinger': lambda: eytzinger.lower_bound(targets),
+               f'B-tree (B={B})': lambda: btree.lower_bound(targets),
+               'interpolation': lambda: interp_search(keys, targets)}
+
+    # Time each method and check its answers
+    times = {}
+    for label, method in methods.items():
+        start = time.perf_counter()
+        res = method()
+        times[label] = time.perf_counter() - start
+        assert np.array_equal(res, expected), label
+        print(f'{label}: {num_queries / times[label]:.0f} queries/s')
+    return times
+
+if __name__ == '__main__':
+
+    # Initialize failure count
+    failures = 0
+    # Random sorted arrays of several sizes, with repeats and misses
+    for n in [0, 1, 2, 7, 100, 1000, 4097]:
+        test_array = np.sort(np.random.randint(-999, 999, size=n))
+        targets = np.random.randint(-1100, 1100, size=500)
+        expected = np.searchsorted(test_array, targets)
+        for B in [1, 2, 8]:
+            tree = StaticSearchTree(test_array, B, is_sorted=True)
+            if not (np.array_equal(tree.lower_bound(targets), expected) and
+                    np.array_equal(tree.contains(targets),
+                                   np.isin(targets, test_array))):
+                print('Random testing failed!')
+                failures += 1
+        if not (np.array_equal(bisect_batch(test_array, targets), expected) and
+                np.array_equal(interp_search(test_array, targets), expected)):
+            print('Random testing failed!')
+            failures += 1
+
+    # Saving and memory-mapping a layout gives the same answers
+    test_dir = tempfile.mkdtemp()
+    test_path = os.path.join(test_dir, 'static_search_test')
+    tree.save(test_path)
+    loaded = StaticSearchTree.load(test_path)
+    if not (np.array_equal(loaded.lower_bound(targets), expected) and
+            np.array_equal(loaded.contains(targets),
+                           np.isin(targets, test_array))):
+        print('Random testing failed!')
+        failures += 1
+    del loaded
+    shutil.rmtree(test_dir)
+
+    # Infinite keys and targets
+    inf_keys = np.array([-np.inf, 0., 1., 2., np.inf, np.inf])
+    inf_targets = np.array([-np.inf, -1., 0., 1.5, 2., 3., np.inf])
+    if not np.array_equal(interp_search(inf_keys, inf_targets),
+                          np.searchsorted(inf_keys, inf_targets)):
+        print('Random testing failed!')
+        failures += 1
+
+    if failures == 0:
+        print('Passed all random tests!')
+
+    # Benchmark against plain bisection
+    bench_static_search()
\ No newline at end of file
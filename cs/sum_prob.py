@@ -5,6 +5,10 @@ Andrew J. Graves
 9/29/20
 """
 
+# Import modules
+from collections import deque
+import numpy as np
+
 # The following functions passed all of the tests on the 
 # 2-SUM and 3-SUM LeetCode problems respectively:
 
@@ -23,48 +27,295 @@ def two_sum(nums, target): # Assumes one solution, as specified by Leet Code
         # Append key (list value) and value (list index) to hash table
         hash_tab[val] = idx
         
-# 3-SUM
-def three_sum(nums):
+# 3-SUM (target 0 by default); sorts once and scans with two pointers, or
+# uses the vectorized scan for large integer inputs
+def three_sum(nums, target=0, vector_min=2000):
 
-    n = len(nums) # list size
-    
-    # Handles slow LeetCode edge cases (many repeats) with hash tables
-    if set(nums) == {0} and n > 2: # all 0
-        return [[0, 0, 0]]
-    elif set(nums) == {-1, 0, 1} and n > 2: # all -1, 0, or 1
-        if len([i for i in nums if i ==0]) > 2: # checks to include [0,0,0] or not
-            return [[0, 0, 0], list(set(nums))]
+    # Large integer inputs go through the NumPy scan
+    arr = np.asarray(nums)
+    if len(arr) >= vector_min and arr.dtype.kind in 'iu':
+        return three_sum_np(arr, target)
+    return k_sum(nums, 3, target)
+
+# Every distinct pair of sorted_nums[start:] summing to target (two pointers)
+def two_pointer(sorted_nums, target, start=0):
+
+    res = []
+    lo, hi = start, len(sorted_nums) - 1
+    while lo < hi:
+        pair_sum = sorted_nums[lo] + sorted_nums[hi]
+        if pair_sum < target:
+            lo += 1
+        elif pair_sum > target:
+            hi -= 1
         else:
-            return [list(set(nums))]
-    
-    # Initialize an empty hash table and results
-    hash_tab = {}
+            res.append([sorted_nums[lo], sorted_nums[hi]])
+            # Skip repeats of both values, so each pair is reported once
+            lo += 1
+            while lo < hi and sorted_nums[lo] == sorted_nums[lo-1]:
+                lo += 1
+            hi -= 1
+    return res
+
+# k-SUM: every distinct k-tuple (sorted ascending) of nums summing to target
+def k_sum(nums, k, target=0):
+
+    # Sort once; the recursion works on positions of the sorted list
+    if isinstance(nums, np.ndarray):
+        nums = nums.tolist()
+    sorted_nums = sorted(nums)
+    return _k_sum(sorted_nums, k, target, 0) if k > 0 else []
+
+# Fix the smallest value of the tuple and recurse on the rest
+def _k_sum(sorted_nums, k, target, start):
+
+    n = len(sorted_nums)
+    if n - start < k:
+        return []
+    # Prune targets outside the reachable range
+    if (k * sorted_nums[start] > target or
+            k * sorted_nums[-1] < target):
+        return []
+    if k == 1:
+        return [[target]] if target in sorted_nums[start:] else []
+    if k == 2:
+        return two_pointer(sorted_nums, target, start)
+
     res = []
-    
-    # Iterate through the list (inner loop handles nth element)
-    for i in range(n-1):
-        
-        # Iterate to the right of i
-        for j in range(i+1, n):
-            
-            # Compute the complement of the ith and jth index that sums to 0
-            sum_0 = -1 * (nums[i] + nums[j])
-            
-            # If that complement exists in the hash table
-            # and is not the same index as i or j (i.e., no duplication)
-            if sum_0 in hash_tab and hash_tab[sum_0] not in [i, j]:
-                
-                # Generate a unique key for the result entry
-                unique = sorted([nums[i], nums[j], sum_0])
-                key = ''.join([str(val) for val in unique])
-                
-                # Store the results in the hash table and results list
-                if key not in hash_tab:
-                    hash_tab[key] = None
-                    res.append([nums[i], nums[j], sum_0])
-
-            # Move to the next element in the list
-            else:
-                # Add key (nums value) and value (nums index) to hash table
-                hash_tab[nums[j]] = j
-    return res
\ No newline at end of file
+    for i in range(start, n - k + 1):
+        # Each distinct smallest value is tried once
+        if i > start and sorted_nums[i] == sorted_nums[i-1]:
+            continue
+        for rest in _k_sum(sorted_nums, k - 1, target - sorted_nums[i], i + 1):
+            res.append([sorted_nums[i]] + rest)
+    return res
+
+# Vectorized 3-SUM for integer arrays over the distinct values and their
+# counts: for each smallest value a, every middle value b >= a is checked at
+# once with searchsorted for the third value c >= b
+def three_sum_np(nums, target=0):
+
+    vals, counts = np.unique(np.asarray(nums), return_counts=True)
+    vals = vals.astype(np.int64)
+    m = len(vals)
+    triples = []
+    for a in range(m):
+        # The smallest value can only grow from here
+        if 3 * vals[a] > target:
+            break
+        # Middle values a <= b <= c, so b is at most half of what is left
+        stop = np.searchsorted(vals, (target - vals[a]) // 2, 'right')
+        b = np.arange(a, stop)
+        need = target - vals[a] - vals[b]
+        c = np.minimum(np.searchsorted(vals, need), m - 1)
+        ok = vals[c] == need
+        b, c = b[ok], c[ok]
+        # Repeated values need enough copies in nums
+        ok = ((counts[a] >= 1 + (b == a) + (c == a)) &
+              ((b == a) | (counts[b] >= 1 + (c == b))))
+        triples.append(np.stack([np.full(ok.sum(), a), b[ok], c[ok]], axis=1))
+
+    if not triples:
+        return []
+    return vals[np.concatenate(triples)].tolist()
+
+# Reusable 2-SUM index over nums for many targets: a value -> indices
+# multimap kept as a stable sort (positions of each value are contiguous)
+class PairSumIndex:
+
+    # Constructor for PairSumIndex class
+    def __init__(self, nums):
+        self.nums = np.asarray(nums)
+        self.n = len(self.nums)
+        # Indices of each value in ascending order
+        self.perm = np.argsort(self.nums, kind='stable')
+        self.sorted_vals = self.nums[self.perm]
+        # Distinct values, where their indices start in perm, and the first
+        # (smallest) index of each
+        self.vals, self.starts, self.counts = np.unique(
+            self.sorted_vals, return_index=True, return_counts=True)
+        self.first = self.perm[self.starts]
+
+    # Indices of every occurrence of a value (ascending)
+    def indices(self, val):
+        a = np.searchsorted(self.vals, val)
+        if a == len(self.vals) or self.vals[a] != val:
+            return np.zeros(0, dtype=np.int64)
+        return self.perm[self.starts[a]:self.starts[a] + self.counts[a]]
+
+    # The pair two_sum would return for each target ([-1, -1] if none)
+    # Scans blocks of j (doubling in size) for the unresolved targets only, so
+    # like two_sum a target stops as soon as its first pair shows up
+    # max_elems: bound on the (targets x block) scratch array
+    def query(self, targets, block=256, max_elems=2**22):
+        t = np.atleast_1d(targets)
+        res = np.full((len(t), 2), -1, dtype=np.int64)
+        if self.n < 2:
+            return res
+        todo = np.arange(len(t))
+        lo = 0
+
+        while lo < self.n and len(todo):
+            hi = min(lo + block, self.n)
+            pos = np.arange(lo, hi)
+            chunk = max(max_elems // (hi - lo), 1)
+            solved = []
+            for start in range(0, len(todo), chunk):
+                rows = todo[start:start + chunk]
+                # Complement each j needs, and whether it occurs before j
+                need = t[rows, None] - self.nums[None, lo:hi]
+                a = np.minimum(np.searchsorted(self.vals, need),
+                               len(self.vals) - 1)
+                found = (self.vals[a] == need) & (self.first[a] < pos)
+                # two_sum stops at the first such j...
+                hit = np.flatnonzero(found.any(axis=1))
+                for row, jj in zip(rows[hit].tolist(),
+                                   (lo + found[hit].argmax(axis=1)).tolist()):
+                    # ...and pairs it with the last complement seen before j
+                    cand = self.indices(t[row] - self.nums[jj])
+                    res[row] = cand[np.searchsorted(cand, jj) - 1], jj
+                solved.append(rows[hit])
+            todo = np.setdiff1d(todo, np.concatenate(solved))
+            lo, block = hi, 2 * block
+
+        return res if np.ndim(targets) else res[0]
+
+    # Every index pair (i < j) with nums[i] + nums[j] == target, in order
+    def all_pairs(self, target):
+        # Distinct values v <= target - v whose complement occurs
+        need = target - self.vals
+        b = np.minimum(np.searchsorted(self.vals, need), len(self.vals) - 1)
+        match = np.flatnonzero((self.vals[b] == need) & (self.vals <= need))
+
+        pairs = []
+        for a, c in zip(match.tolist(), b[match].tolist()):
+            left = self.perm[self.starts[a]:self.starts[a] + self.counts[a]]
+            right = self.perm[self.starts[c]:self.starts[c] + self.counts[c]]
+            i, j = np.meshgrid(left, right, indexing='ij')
+            # A value paired with itself needs two different indices
+            keep = i < j if a == c else np.ones(i.shape, dtype=bool)
+            lo, hi = np.minimum(i, j)[keep], np.maximum(i, j)[keep]
+            pairs.append(np.stack([lo, hi], axis=1))
+
+        if not pairs:
+            return np.zeros((0, 2), dtype=np.int64)
+        pairs = np.concatenate(pairs)
+        return pairs[np.lexsort((pairs[:, 1], pairs[:, 0]))]
+
+# Streaming 2-SUM over a sliding window of the last width items: each value
+# keeps a deque of its stream positions, so add and drop are O(1)
+class PairSumWindow:
+
+    # Constructor for PairSumWindow class
+    def __init__(self, width, target=None):
+        self.width = width
+        self.target = target
+        self.window = deque() # (position, value) in arrival order
+        self.where = {} # value -> deque of positions in the window
+        self.t = 0 # stream position of the next item
+
+    # Number of items in the window
+    def __len__(self):
+        return len(self.window)
+
+    # Drop the oldest item
+    def drop(self):
+        pos, val = self.window.popleft()
+        positions = self.where[val]
+        positions.popleft()
+        if not positions:
+            del self.where[val]
+
+    # Add the next item; returns the positions of the other items in the
+    # window (the last width items, itself included) it pairs with to make
+    # target
+    def add(self, val, target=None):
+        target = self.target if target is None else target
+
+        # Slide the window first, so partners and pairs() see the same items
+        if len(self.window) == self.width:
+            self.drop()
+        partners = []
+        if target is not None:
+            partners = list(self.where.get(target - val, ()))
+
+        # Record the new item
+        self.window.append((self.t, val))
+        self.where.setdefault(val, deque()).append(self.t)
+        self.t += 1
+        return partners
+
+    # Every pair of window positions (i < j) whose values make target
+    def pairs(self, target):
+        res = []
+        for val, positions in self.where.items():
+            other = self.where.get(target - val)
+            if other is None or val > target - val:
+                continue
+            for i in positions:
+                for j in other:
+                    # A value paired with itself needs two different items
+                    if val < target - val or i < j:
+                        res.append((min(i, j), max(i, j)))
+        return sorted(res)
+
+if __name__ == '__main__':
+
+    from itertools import combinations
+
+    # Initialize failure count
+    failures = 0
+    # Compare against brute force on small random lists
+    for j in range(200):
+        test_list = list(np.random.randint(-10, 10, size=np.random.randint(0, 25)))
+        test_list = [int(x) for x in test_list]
+        target = int(np.random.randint(-5, 6))
+        for k in [2, 3, 4]:
+            expected = sorted({tuple(sorted(c)) for c in combinations(test_list, k)
+                               if sum(c) == target})
+            if [tuple(t) for t in k_sum(test_list, k, target)] != expected:
+                print('Random testing failed!')
+                failures += 1
+            if k == 3 and [tuple(t) for t in
+                           three_sum_np(test_list, target)] != expected:
+                print('Random testing failed!')
+                failures += 1
+
+    # Vectorized and two-pointer scans agree on a large integer array
+    test_list = np.random.randint(-500, 500, size=3000)
+    if three_sum(test_list) != k_sum(test_list.tolist(), 3, 0):
+        print('Random testing failed!')
+        failures += 1
+
+    # Pair-sum index against two_sum and brute force
+    test_list = np.random.randint(-20, 20, size=300)
+    test_index = PairSumIndex(test_list)
+    targets = np.random.randint(-45, 45, size=200)
+    for t, pair in zip(targets, test_index.query(targets, max_elems=5000)):
+        expected = two_sum(test_list, t)
+        if list(pair) != (expected or [-1, -1]):
+            print('Random testing failed!')
+            failures += 1
+        expected = [(i, j) for i, j in combinations(range(300), 2)
+                    if test_list[i] + test_list[j] == t]
+        if list(map(tuple, test_index.all_pairs(t).tolist())) != expected:
+            print('Random testing failed!')
+            failures += 1
+
+    # Sliding window against brute force over the last width items
+    test_window = PairSumWindow(25, target=3)
+    for pos, val in enumerate(test_list.tolist()):
+        partners = test_window.add(val)
+        expected = [i for i in range(max(pos - 24, 0), pos)
+                    if test_list[i] + val == 3]
+        if partners != expected:
+            print('Random testing failed!')
+            failures += 1
+    expected = [(i, j) for i, j in combinations(range(275, 300), 2)
+                if test_list[i] + test_list[j] == 3]
+    if test_window.pairs(3) != expected:
+        print('Random testing failed!')
+        failures += 1
+
+    if failures == 0:
+        print('Passed all random tests!')
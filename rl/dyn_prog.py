@@ -6,132 +6,557 @@ Andrew J. Graves
 """
 
 # Import modules
+import heapq
+import os
+from multiprocessing import Pool, shared_memory
 import numpy as np
 
-# Synchronous policy evaluation algorithm
-def policy_eval(policy, P, R, gamma, theta, max_iter=1e8):
+# Sum consecutive segments of x delimited by offsets (empty segments sum to 0)
+def segment_sum(x, offsets):
 
-    # Initialization 
-    num_S, num_a = policy.shape # get state and action counts   
-    v = np.zeros(num_S) # value function
+    # Initialize sums at 0 (x may carry trailing batch dimensions)
+    out = np.zeros((len(offsets) - 1,) + x.shape[1:])
+    # Only reduce over segments that hold at least one element
+    nonempty = offsets[1:] > offsets[:-1]
+    if np.any(nonempty):
+        out[nonempty] = np.add.reduceat(x, offsets[:-1][nonempty], axis=0)
+    return out
+
+# Sparse transition model stored in compressed-row (CSR) format
+class CSRModel:
+
+    # Rows of the model are (s, a) pairs (row index s*num_a + a), columns are s'
+    # Rewards are stored as expected rewards for each (s, a) pair
+
+    # Constructor for CSRModel class
+    def __init__(self, indptr, indices, probs, rewards):
+        # Row pointers, next states (s'), and transition probabilities
+        self.indptr = indptr
+        self.indices = indices
+        self.probs = probs
+        # Expected reward of each state-action pair
+        self.rewards = rewards
+        # Get state and action counts
+        self.num_S, self.num_a = rewards.shape
+        # Mirror the shape of a dense P so solvers can stay agnostic
+        self.shape = (self.num_S, self.num_a, self.num_S)
+
+    # Build the model from dense P and R arrays of shape [S, A, S']
+    @classmethod
+    def from_dense(cls, P, R):
+        num_S, num_a = P.shape[:2]
+        # Get the nonzero transitions of every (s, a) row
+        rows, sp = np.nonzero(P.reshape(num_S * num_a, -1))
+        probs = P.reshape(num_S * num_a, -1)[rows, sp]
+        # Row pointers from the number of transitions in each row
+        indptr = np.zeros(num_S * num_a + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=num_S * num_a), out=indptr[1:])
+        # Expected reward of each (s, a) pair
+        rewards = np.einsum('ijk,ijk->ij', P, R)
+        return cls(indptr, sp.astype(_index_dtype(num_S)), probs, rewards)
+
+    # Build the model from (s, a, s', p, r) triples
+    @classmethod
+    def from_triples(cls, s, a, sp, p, r, num_S=None, num_a=None):
+        s, a, sp = np.asarray(s), np.asarray(a), np.asarray(sp)
+        p, r = np.asarray(p, dtype=float), np.asarray(r, dtype=float)
+        # Infer state and action counts if they were not given
+        if num_S is None:
+            num_S = int(max(s.max(), sp.max())) + 1
+        if num_a is None:
+            num_a = int(a.max()) + 1
+        # Sort the triples by row, then by next state
+        rows = s.astype(np.int64) * num_a + a
+        order = np.lexsort((sp, rows))
+        rows, sp, p, r = rows[order], sp[order], p[order], r[order]
+        # Row pointers from the number of transitions in each row
+        indptr = np.zeros(num_S * num_a + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=num_S * num_a), out=indptr[1:])
+        # Expected reward of each (s, a) pair
+        rewards = np.bincount(rows, weights=p * r, minlength=num_S * num_a)
+        return cls(indptr, sp.astype(_index_dtype(num_S)), p,
+                   rewards.reshape(num_S, num_a))
+
+    # Number of stored transitions
+    @property
+    def nnz(self):
+        return len(self.probs)
+
+    # Bellman backup for a block of states in O(nnz) of the block
+    def backup(self, gamma, v, states=slice(None)):
+
+        num_a = self.num_a
+        # Contiguous block of states maps to a contiguous block of transitions
+        if isinstance(states, slice):
+            start, stop, _ = states.indices(self.num_S)
+            offsets = self.indptr[start*num_a:stop*num_a + 1]
+            lo, hi = offsets[0], offsets[-1]
+            ev = self.probs[lo:hi] * v[self.indices[lo:hi]]
+            offsets = offsets - lo
+        # Arbitrary states have to gather their transitions
+        else:
+            rows = (np.asarray(states)[:, None] * num_a
+                    + np.arange(num_a)).ravel()
+            starts = self.indptr[rows]
+            lengths = self.indptr[rows + 1] - starts
+            offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+            np.cumsum(lengths, out=offsets[1:])
+            gather = (np.repeat(starts - offsets[:-1], lengths)
+                      + np.arange(offsets[-1]))
+            ev = self.probs[gather] * v[self.indices[gather]]
+
+        # Expected immediate reward plus discounted expected next-state value
+        ev = segment_sum(ev, offsets).reshape(-1, num_a)
+        return self.rewards[states] + gamma * ev
+
+    # Expected next-state value of every (s, a) pair for one or more v columns
+    def expected_value(self, v):
+
+        # Broadcast the probabilities over any batch of value functions
+        probs = self.probs.reshape((-1,) + (1,) * (v.ndim - 1))
+        ev = segment_sum(probs * v[self.indices], self.indptr)
+        return ev.reshape((self.num_S, self.num_a) + v.shape[1:])
+
+    # Dense transition matrix [S, S'] and expected rewards [S] under a policy
+    def policy_model(self, policy):
+
+        # Weight each transition by the probability of taking its action
+        rows = np.repeat(np.arange(self.num_S * self.num_a),
+                         np.diff(self.indptr))
+        weights = self.probs * policy.ravel()[rows]
+        # Accumulate the transitions of each state
+        P_pi = np.zeros([self.num_S, self.num_S])
+        np.add.at(P_pi, (rows // self.num_a, self.indices), weights)
+        r_pi = np.sum(policy * self.rewards, axis=1)
+        return P_pi, r_pi
+
+# Smallest integer type that can index num_S states
+def _index_dtype(num_S):
+    return np.int32 if num_S <= np.iinfo(np.int32).max else np.int64
+
+# Bellman backup for a block of states (returns action values of shape [S, A])
+# P can be a dense [S, A, S'] array or a CSRModel (R is then ignored)
+def state_backup(P, R, gamma, v, states=slice(None)):
+
+    # Sparse models back up from their own compressed rows
+    if isinstance(P, CSRModel):
+        return P.backup(gamma, v, states)
+
+    # Get the transition and reward rows for the block of states
+    P_s = P[states]
+    R_s = R[states]
+    # Expected immediate reward plus discounted expected next-state value
+    return np.einsum('ijk,ijk->ij', P_s, R_s) + gamma * (P_s @ v)
+
+# Bellman backup over the full state sweep as batched array operations
+def bellman_backup(P, R, gamma, v, chunk_size=None):
+
+    # Initialization
+    num_S, num_a = P.shape[:2] # get state and action counts
+
+    # Back up every state at once if no chunk size was given
+    if chunk_size is None:
+        return state_backup(P, R, gamma, v)
+
+    # Otherwise, only hold chunk_size states of P and R in memory at a time
+    av = np.empty([num_S, num_a])
+    for start in range(0, num_S, chunk_size):
+        stop = min(start + chunk_size, num_S)
+        av[start:stop] = state_backup(P, R, gamma, v, slice(start, stop))
+
+    return av
+
+# Transition matrix [S, S'] and expected rewards [S] under a fixed policy
+def policy_model(policy, P, R):
+
+    # Sparse models build the (dense) policy matrix from their own rows
+    if isinstance(P, CSRModel):
+        return P.policy_model(policy)
+
+    # Average the transitions and expected rewards over the policy
+    P_pi = np.einsum('ij,ijk->ik', policy, P)
+    r_pi = np.einsum('ij,ijk,ijk->i', policy, P, R)
+    return P_pi, r_pi
+
+# Policy evaluation algorithm
+# update: 'jacobi' (synchronous sweeps) or 'gauss-seidel' (in-place sweeps
+#         over blocks of chunk_size states, one state at a time by default)
+# initial_v: warm start for the value function (zeros by default)
+# max_iter: cap on sweeps (small values give truncated evaluation)
+# exact: directly solve (I - gamma*P_pi)v = r_pi instead of sweeping
+def policy_eval(policy, P, R, gamma, theta, max_iter=1e8, chunk_size=None,
+                initial_v=None, update='jacobi', exact=False):
+
+    # Initialization
+    num_S, num_a = policy.shape # get state and action counts
+
+    # Solve the Bellman expectation equation as a linear system
+    # (requires gamma < 1 or a policy that reaches an absorbing state)
+    if exact:
+        P_pi, r_pi = policy_model(policy, P, R)
+        return np.linalg.solve(np.eye(num_S) - gamma * P_pi, r_pi)
+
+    # Value function (warm start if provided)
+    if initial_v is None:
+        v = np.zeros(num_S)
+    else:
+        v = np.array(initial_v, dtype=float)
     k = 0 # counter of iteration
-    
+
+    # Update blocks of states in place for Gauss-Seidel sweeps
+    if update == 'gauss-seidel':
+        if chunk_size is None:
+            chunk_size = 1
+        blocks = [slice(start, min(start + chunk_size, num_S))
+                  for start in range(0, num_S, chunk_size)]
+    elif update != 'jacobi':
+        raise ValueError(f'Unknown update {update!r}')
+
     # Start delta > theta
-    delta = 1
+    delta = theta + 1
     # Iterate until solution has converged
     while delta > theta and k < max_iter:
-        # Reset delta to 0
-        delta = 0
-        
-        # Store old state values
-        old_v = v.copy()
-        # Begin state sweep
-        for s in range(num_S):
-            # Initialize action value storage
-            av = []
-            # Consider all possible actions
-            for a in range(num_a):
-                # Get next states (s')
-                sp = np.where(P[s][a])
-                # Compute the Bellman optimality equation
-                av.append(policy[s][a] * np.sum(P[s][a][sp] * (R[s][a][sp] + gamma*old_v[sp])))
-
-            # Update value of the current state
-            v[s] = np.sum(av)
-            
+
+        if update == 'jacobi':
+            # Store old state values
+            old_v = v
+            # Compute the Bellman expectation equation for the whole sweep
+            v = np.sum(policy * bellman_backup(P, R, gamma, old_v, chunk_size),
+                       axis=1)
             # Update convergence test
-            delta = max(delta, abs(old_v[s]-v[s]))
+            delta = np.max(np.abs(old_v - v))
+        else:
+            # Reset delta to 0
+            delta = 0
+            # Sweep the blocks, using the newest values of earlier blocks
+            for b in blocks:
+                new_v = np.sum(policy[b] * state_backup(P, R, gamma, v, b),
+                               axis=1)
+                # Update convergence test
+                delta = max(delta, np.max(np.abs(v[b] - new_v)))
+                v[b] = new_v
+
         # Update counter
         k += 1
-    
+
     return v
-    
+
 # Policy improvement algorithm.
-def policy_imprv(P, R, gamma, policy, v):
+def policy_imprv(P, R, gamma, policy, v, chunk_size=None):
 
-    # Initialization    
+    # Initialization
     num_S, num_a = policy.shape # get state and action counts
-    policy_new = np.zeros([num_S,num_a]) # start policy at 0 everywhere
-    policy_stable = True # start with stable policy
-    
-    # Begin state sweep
-    for s in range(num_S):
-        # Store the old policy
-        old_action = policy[s]
-        # Initialize action value storage
-        av = []
-        # Consider all possible actions
-        for a in range(num_a):
-            # Get next states (s')
-            sp = np.where(P[s][a])
-            # Compute the Bellman optimality equation
-            av.append(np.sum(P[s][a][sp] * (R[s][a][sp] + gamma*v[sp])))
-            
-        # Take action with largest value
-        # Break ties arbitrarily (take earliest max index)
-        policy_new[s] = np.eye(num_a)[np.argmax(av)]
-
-        # If the old and new policy are not the same
-        if not np.array_equal(old_action, policy_new[s]):
-            policy_stable = False
-    
+
+    # Compute the Bellman optimality equation for the whole sweep
+    av = bellman_backup(P, R, gamma, v, chunk_size)
+
+    # Take action with largest value
+    # Break ties arbitrarily (take earliest max index)
+    policy_new = np.eye(num_a)[np.argmax(av, axis=1)]
+
+    # Policy is stable if the old and new policy are the same
+    policy_stable = np.array_equal(policy, policy_new)
+
     return policy_new, policy_stable
 
 # Policy iteration algorithm.
-def policy_iter(P, R, gamma, theta, initial_policy, max_iter=1e6):
+# warm_start: start each evaluation from the previous value function
+# eval_sweeps: evaluate with at most this many (warm) sweeps per iteration
+#              (modified policy iteration)
+# exact, update: evaluation options passed to policy_eval
+def policy_iter(P, R, gamma, theta, initial_policy, max_iter=1e6,
+                chunk_size=None, warm_start=False, eval_sweeps=None,
+                exact=False, update='jacobi'):
 
     policy_stable = False
     policy = np.copy(initial_policy)
     num_iter = 0
-    
+    v = None
+
+    # Truncated evaluation only makes sense from the previous values
+    truncated = eval_sweeps is not None and not exact
+    if truncated:
+        warm_start = True
+    else:
+        eval_sweeps = 1e8
+
     while (not policy_stable) and num_iter < max_iter:
         num_iter += 1
         print('Policy Iteration: ', num_iter)
         # policy evaluation
-        v = policy_eval(policy,P,R,gamma,theta)
+        v = policy_eval(policy,P,R,gamma,theta,eval_sweeps,chunk_size,
+                        v if warm_start else None,update,exact)
         # policy improvement
-        policy, policy_stable = policy_imprv(P,R,gamma,policy,v)
+        policy, policy_stable = policy_imprv(P,R,gamma,policy,v,chunk_size)
+
+        # A truncated evaluation can look stable before v has converged,
+        # so finish evaluating the policy and check it once more
+        if policy_stable and truncated:
+            v = policy_eval(policy,P,R,gamma,theta,chunk_size=chunk_size,
+                            initial_v=v,update=update)
+            policy, policy_stable = policy_imprv(P,R,gamma,policy,v,
+                                                 chunk_size)
     return policy, v
 
-# In-place value iteration algorithm
-def value_iter(P, R, gamma, theta, initial_v, max_iter=1e8):  
-    
+# Synchronous value iteration algorithm (updates initial_v in place)
+def value_iter(P, R, gamma, theta, initial_v, max_iter=1e8, chunk_size=None):
+
     # Initialization
     v = initial_v # value function
-    num_S, num_a = P.shape[:2] # get state and action counts
+    num_S = P.shape[0] # get state count
     best_actions = [0] * num_S # start actions at 0
     k = 0 # counter of iteration
-    
+
     # Start delta > theta
     delta = theta + 1
     # Iterate until solution has converged
     while delta > theta and k < max_iter:
-        # Reset delta to 0
-        delta = 0
-        
-        # Begin state sweep
-        for s in range(num_S):
-            # Assign the previous value function
-            old_v = v[s]
-            # Initialize action value storage
-            av = []
-            # Consider all possible actions
-            for a in range(num_a):
-                # Get next states
-                sp = np.where(P[s][a])
-                # Compute the Bellman optimality equation
-                av.append(np.sum(P[s][a][sp] * (R[s][a][sp] + gamma*v[sp])))
-
-            # Update value of the current state
-            v[s] = np.max(av)
-            # Get best actions
-            best_actions[s] = np.argmax(av)
-            
-            # Update convergence test
-            delta = max(delta, abs(old_v-v[s]))
-            
+
+        # Compute the Bellman optimality equation for the whole sweep
+        av = bellman_backup(P, R, gamma, v, chunk_size)
+        # Get best value of each state
+        new_v = np.max(av, axis=1)
+
+        # Update convergence test
+        delta = np.max(np.abs(v - new_v))
+        # Update value of every state
+        v[:] = new_v
+
         # Update counter
         k += 1
-    
+
+    # Get best actions from the final sweep
+    if k > 0:
+        best_actions = list(np.argmax(av, axis=1))
+
+    print('number of iterations:', k)
+    return best_actions, v
+
+# Predecessor index: states that can transition into each state (CSR format)
+def predecessors(P):
+
+    num_S = P.shape[0]
+    if isinstance(P, CSRModel):
+        # Pair each stored transition's next state with its state
+        s = np.repeat(np.arange(P.num_S * P.num_a) // P.num_a,
+                      np.diff(P.indptr))
+        pairs = np.unique(P.indices.astype(np.int64) * num_S + s)
+        sp, s = pairs // num_S, pairs % num_S
+    else:
+        # (s', s) pairs where any action leads from s to s'
+        sp, s = np.nonzero(np.any(P, axis=1).T)
+
+    # Row pointers from the number of predecessors of each state
+    pred_ptr = np.zeros(num_S + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sp, minlength=num_S), out=pred_ptr[1:])
+    return pred_ptr, s
+
+# Prioritized-sweeping (asynchronous) value iteration (updates initial_v in place)
+# States are backed up in order of their Bellman error, batch_size at a time
+def value_iter_prioritized(P, R, gamma, theta, initial_v, max_backups=1e8,
+                           batch_size=1):
+
+    # Initialization
+    v = initial_v # value function
+    num_S = P.shape[0] # get state count
+    pred_ptr, pred_idx = predecessors(P) # who needs updating after a backup
+    num_backups = 0 # counter of state backups
+
+    # Initial priorities are the Bellman errors of every state
+    priority = np.abs(np.max(bellman_backup(P, R, gamma, v), axis=1) - v)
+    # Max-priority queue of states (heapq is a min-heap, so negate priorities)
+    queue = [(-e, s) for s, e in enumerate(priority) if e > theta]
+    heapq.heapify(queue)
+
+    # Continue until no state has a Bellman error above theta
+    while queue and num_backups < max_backups:
+
+        # Pop the states with the largest Bellman errors
+        batch = []
+        while queue and len(batch) < batch_size:
+            neg_e, s = heapq.heappop(queue)
+            # Skip stale entries whose priority has since changed
+            if -neg_e == priority[s]:
+                batch.append(s)
+                priority[s] = 0
+        if not batch:
+            continue
+
+        # Back up the popped states
+        batch = np.array(batch)
+        v[batch] = np.max(state_backup(P, R, gamma, v, batch), axis=1)
+        num_backups += len(batch)
+
+        # Recompute the Bellman error of every predecessor of the batch
+        preds = np.unique(np.concatenate(
+            [pred_idx[pred_ptr[s]:pred_ptr[s+1]] for s in batch]))
+        errors = np.abs(np.max(state_backup(P, R, gamma, v, preds), axis=1)
+                        - v[preds])
+        priority[preds] = errors
+        # Push the predecessors that still need a backup
+        for s, e in zip(preds, errors):
+            if e > theta:
+                heapq.heappush(queue, (-e, s))
+
+    # Get best actions
+    best_actions = list(np.argmax(bellman_backup(P, R, gamma, v), axis=1))
+
+    print('number of backups:', num_backups)
+    return best_actions, v
+
+# Arrays and model attached by each parallel value iteration worker
+_worker = {}
+
+# Copy an array into a new shared memory block
+def _share(arr):
+    shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+    np.ndarray(arr.shape, arr.dtype, buffer=shm.buf)[...] = arr
+    return shm, (shm.name, arr.shape, arr.dtype.str)
+
+# Attach a worker process to the shared arrays
+def _init_worker(specs, gamma):
+
+    # Keep the shared memory handles alive alongside their array views
+    _worker['shm'] = []
+    arrays = {}
+    for key, (name, shape, dtype) in specs.items():
+        shm = shared_memory.SharedMemory(name=name)
+        _worker['shm'].append(shm)
+        arrays[key] = np.ndarray(shape, dtype, buffer=shm.buf)
+
+    # Rebuild the transition model from its shared arrays
+    if 'indptr' in arrays:
+        _worker['P'] = CSRModel(arrays['indptr'], arrays['indices'],
+                                arrays['probs'], arrays['rewards'])
+        _worker['R'] = None
+    else:
+        _worker['P'], _worker['R'] = arrays['P'], arrays['R']
+    _worker['v'], _worker['actions'] = arrays['v'], arrays['actions']
+    _worker['gamma'] = gamma
+
+# Back up one partition of the states (reads v[src], writes v[1-src])
+def _sweep_partition(args):
+
+    start, stop, src = args
+    v = _worker['v']
+    # Compute the Bellman optimality equation for the partition
+    av = state_backup(_worker['P'], _worker['R'], _worker['gamma'], v[src],
+                      slice(start, stop))
+    v[1-src, start:stop] = np.max(av, axis=1)
+    _worker['actions'][start:stop] = np.argmax(av, axis=1)
+    # Return the partition's contribution to the convergence test
+    return np.max(np.abs(v[1-src, start:stop] - v[src, start:stop]))
+
+# Parallel synchronous value iteration over state partitions
+# (updates initial_v in place)
+def value_iter_parallel(P, R, gamma, theta, initial_v, max_iter=1e8,
+                        num_workers=None, chunk_size=None):
+
+    # Initialization
+    v = initial_v # value function
+    num_S = P.shape[0] # get state count
+    num_workers = num_workers or os.cpu_count() # size of the process pool
+    k = 0 # counter of iteration
+
+    # Share the model, a double-buffered value function and the best actions
+    if isinstance(P, CSRModel):
+        arrays = {'indptr': P.indptr, 'indices': P.indices,
+                  'probs': P.probs, 'rewards': P.rewards}
+    else:
+        arrays = {'P': np.asarray(P), 'R': np.asarray(R)}
+    arrays['v'] = np.stack([v, v]).astype(float)
+    arrays['actions'] = np.zeros(num_S, dtype=np.int64)
+    shared = {key: _share(arr) for key, arr in arrays.items()}
+    specs = {key: spec for key, (_, spec) in shared.items()}
+    v_shared = np.ndarray((2, num_S), float, buffer=shared['v'][0].buf)
+    actions = np.ndarray(num_S, np.int64, buffer=shared['actions'][0].buf)
+
+    try:
+        with Pool(num_workers, _init_worker, (specs, gamma)) as pool:
+            # Split the states into one partition per worker by default
+            if chunk_size is None:
+                chunk_size = -(-num_S // num_workers)
+            bounds = [(start, min(start + chunk_size, num_S))
+                      for start in range(0, num_S, chunk_size)]
+
+            # Start delta > theta
+            delta = theta + 1
+            # Iterate until solution has converged
+            while delta > theta and k < max_iter:
+                # Every worker sweeps its partitions from the same values
+                src = k % 2
+                deltas = pool.map(_sweep_partition,
+                                  [(start, stop, src) for start, stop in bounds])
+                # Global convergence test
+                delta = max(deltas)
+                # Update counter
+                k += 1
+
+        # Copy the results out of shared memory
+        v[:] = v_shared[k % 2]
+        best_actions = list(actions) if k > 0 else [0] * num_S
+    finally:
+        # Release the shared memory
+        del v_shared, actions
+        for shm, _ in shared.values():
+            shm.close()
+            shm.unlink()
+
     print('number of iterations:', k)
-    return best_actions, v
\ No newline at end of file
+    return best_actions, v
+
+# Batched value iteration over reward and/or discount variants of one model
+# R: dense rewards of shape [S, A, S'] or a stack [B, S, A, S']; for a CSRModel
+#    None (use the model's rewards) or expected rewards of shape [B, S, A]
+# gammas: a discount factor or a vector of B discount factors
+# Returns greedy actions and value functions of shape [B, S]
+def value_iter_batch(P, R, gammas, theta, initial_v=None, max_iter=1e8):
+
+    # Initialization
+    num_S, num_a = P.shape[:2] # get state and action counts
+
+    # Expected reward of each (s, a) pair for every problem in the batch
+    if isinstance(P, CSRModel):
+        r_exp = P.rewards if R is None else np.asarray(R)
+    else:
+        R = np.asarray(R)
+        r_exp = np.einsum('ijk,...ijk->...ij', P, R)
+    r_exp = r_exp.reshape((-1, num_S, num_a))
+    gammas = np.atleast_1d(np.asarray(gammas, dtype=float))
+    num_B = max(len(r_exp), len(gammas)) # get batch size
+    r_exp = np.broadcast_to(r_exp, (num_B, num_S, num_a))
+    gammas = np.broadcast_to(gammas, (num_B,))
+
+    # Value functions are stored as columns so all problems share each product
+    if initial_v is None:
+        V = np.zeros([num_S, num_B])
+    else:
+        V = np.array(np.broadcast_to(initial_v, (num_B, num_S)).T, dtype=float)
+    best_actions = np.zeros([num_B, num_S], dtype=np.int64)
+    num_iter = np.zeros(num_B, dtype=np.int64) # counter of iterations
+    active = np.arange(num_B) # problems that have not converged
+
+    # Iterate until every problem has converged
+    while active.size and num_iter[active[0]] < max_iter:
+
+        # Expected next-state values of all active problems in one pass
+        if isinstance(P, CSRModel):
+            ev = P.expected_value(V[:, active])
+        else:
+            ev = P @ V[:, active]
+        # Compute the Bellman optimality equation for each problem
+        av = r_exp[active] + gammas[active, None, None] * np.moveaxis(ev, 2, 0)
+        new_v = np.max(av, axis=2)
+
+        # Per-problem convergence test
+        delta = np.max(np.abs(V[:, active].T - new_v), axis=1)
+        # Update values, best actions and counters
+        V[:, active] = new_v.T
+        best_actions[active] = np.argmax(av, axis=2)
+        num_iter[active] += 1
+
+        # Converged problems drop out of the batch
+        active = active[delta > theta]
+
+    print('number of iterations:', num_iter)
+    return best_actions, V.T
\ No newline at end of file
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+Compact array-backed episode store with memory-mapped replay
+Andrew J. Graves
+10/18/26
+"""
+
+# Import modules
+import os
+import numpy as np
+
+# Episodes packed into flat arrays in a directory of raw files:
+# states.bin / actions.bin (int32), rewards.bin (float32, one per state) and
+# offsets.bin (int64, episode i spans offsets[i]:offsets[i+1])
+# New episodes are appended to the files; reads go through np.memmap, and
+# iterating yields (states, actions, rewards) views without copies
+class EpisodeStore:
+
+    # File name and dtype of each array
+    fields = {'states': np.int32, 'actions': np.int32,
+              'rewards': np.float32, 'offsets': np.int64}
+
+    # Constructor for EpisodeStore class (opens or creates the directory)
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        # A new store starts with the offset of its first episode
+        if not os.path.exists(self.file('offsets')):
+            np.zeros(1, dtype=np.int64).tofile(self.file('offsets'))
+        self.refresh()
+
+    # Path of the raw file behind a field
+    def file(self, name):
+        return os.path.join(self.path, name + '.bin')
+
+    # Re-map the files (after appending)
+    def refresh(self):
+        for name, dtype in self.fields.items():
+            # np.memmap cannot map an empty (or missing) file
+            if os.path.exists(self.file(name)) and os.path.getsize(self.file(name)):
+                arr = np.memmap(self.file(name), dtype=dtype, mode='r')
+            else:
+                arr = np.zeros(0, dtype=dtype)
+            setattr(self, name, arr)
+
+    # Number of stored episodes
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    # Number of stored transitions (states)
+    def num_steps(self):
+        return int(self.offsets[-1])
+
+    # Episode i as views of the mapped arrays
+    def __getitem__(self, i):
+        if not -len(self) <= i < len(self):
+            raise IndexError('episode index out of range')
+        i %= len(self)
+        lo, hi = self.offsets[i], self.offsets[i+1]
+        return self.states[lo:hi], self.actions[lo:hi], self.rewards[lo:hi]
+
+    # Iterate over the episodes (e.g., pass as episodes= to mc_evisit or td_*)
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    # Append one episode
+    def append(self, states, actions, rewards):
+        self.extend([(states, actions, rewards)])
+
+    # Append a batch of episodes with one write per file
+    def extend(self, episodes):
+        states, actions, rewards, lengths = [], [], [], []
+        for s, a, r in episodes:
+            s = np.asarray(s, dtype=np.int32)
+            T = len(s)
+            # Missing actions are -1, missing rewards are 0
+            a = np.asarray(a, dtype=np.int32)[:T]
+            r = np.asarray(r, dtype=np.float32)[:T]
+            states.append(s)
+            actions.append(np.concatenate((a, np.full(T - len(a), -1, np.int32))))
+            rewards.append(np.concatenate((r, np.zeros(T - len(r), np.float32))))
+            lengths.append(T)
+        if not lengths:
+            return
+
+        # Offsets continue from the current end of the store
+        ends = self.num_steps() + np.cumsum(lengths, dtype=np.int64)
+        new = {'states': states, 'actions': actions, 'rewards': rewards,
+               'offsets': [ends]}
+        for name, parts in new.items():
+            with open(self.file(name), 'ab') as f:
+                np.concatenate(parts).astype(self.fields[name]).tofile(f)
+        self.refresh()
+
+# Encode an mdp_examp-style episode (a list of (state, action, reward) or
+# (state, reward) tuples of strings) as integer arrays using vocab lists
+# state_vocab / action_vocab: lists of known tokens, extended in place
+def encode_episode(episode, state_vocab, action_vocab=None):
+
+    # Token -> index lookups
+    s_index = {tok: i for i, tok in enumerate(state_vocab)}
+    a_index = {} if action_vocab is None else {tok: i for i, tok
+                                               in enumerate(action_vocab)}
+
+    # Look a token up, adding it to the vocab if it is new
+    def lookup(tok, index, vocab):
+        tok = str(tok)
+        if tok not in index:
+            index[tok] = len(vocab)
+            vocab.append(tok)
+        return index[tok]
+
+    states, actions, rewards = [], [], []
+    for step in episode:
+        states.append(lookup(step[0], s_index, state_vocab))
+        # MRP episodes have no action (stored as -1)
+        if len(step) == 3 and action_vocab is not None:
+            actions.append(lookup(step[1], a_index, action_vocab))
+        else:
+            actions.append(-1)
+        rewards.append(step[-1])
+
+    return (np.array(states, dtype=np.int32), np.array(actions, dtype=np.int32),
+            np.array(rewards, dtype=np.float32))
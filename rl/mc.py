@@ -8,47 +8,89 @@ Andrew J. Graves
 # Import modules
 import numpy as np
 
+# Discounted returns G_t = r_t + gamma*G_{t+1} of one episode
+# rewards are zero-padded (or cut) to length T; the reverse cumulative sum is
+# done in blocks of block_size steps, each a product with an upper-triangular
+# matrix of discount powers, with the return carried between blocks
+def discounted_returns(rewards, gamma, T=None, block_size=256):
+
+    # Pad missing rewards with 0
+    r = np.asarray(rewards, dtype=float)
+    T = len(r) if T is None else T
+    r = np.concatenate((r[:T], np.zeros(max(T - len(r), 0))))
+    if T == 0:
+        return r
+
+    # Discount powers gamma^(j-i) for j >= i within a block
+    L = min(block_size, T)
+    lag = np.arange(L)[None, :] - np.arange(L)[:, None]
+    M = np.where(lag >= 0, float(gamma)**np.maximum(lag, 0), 0)
+
+    # Returns within each (zero-padded) block
+    num_blocks = -(-T // L)
+    R = np.zeros(num_blocks * L)
+    R[:T] = r
+    G = R.reshape(num_blocks, L) @ M.T
+
+    # Carry the return at the start of each block back to the previous one
+    tail = float(gamma)**(L - np.arange(L))
+    for b in range(num_blocks - 2, -1, -1):
+        G[b] += tail * G[b+1, 0]
+
+    return G.ravel()[:T]
+
 # Monte Carlo every-visit algorithm
-def mc_evisit(get_episode, policy, initial_v, gamma, alpha, num_episodes=1):
+# episodes: optional iterable of (states, actions, rewards), e.g. from
+# rollout.rollouts, used instead of calling get_episode
+def mc_evisit(get_episode, policy, initial_v, gamma, alpha, num_episodes=1,
+              episodes=None):
 
     # Initialization  
     num_states = policy.shape[0] # number of states
     v = np.copy(initial_v) # value function
     N_s = np.zeros(num_states) # counter for visits to states
+    if episodes is None:
+        # Generate the episodes one at a time
+        episodes = (get_episode(policy) for _ in range(int(num_episodes)))
    
-    for ep in range(int(num_episodes)):
-        states, _, rewards = get_episode(policy) # generate an episode
-        
-        # Initialize G at 0
-        G = 0
-        # Go backwards through each step of the episode
-        for step in range(len(states)-1, -1, -1):
-            # Get state index
-            s = states[step]
-            
-            # Assumes there is a reward associated with each state
-            try:
-                r = rewards[step]
-            # Handles if len of reward vector < len of state vector
-            except:
-                r = 0
-            
-            # Update G
-            G = gamma*G + r
-            # Update state counter
-            N_s[s] += 1
-            if alpha == 0:
-                # Compute expectation of the value function
-                v[s] += (G - v[s]) / N_s[s]
-            else:
-                # Update the value function with a constant learning rate
-                v[s] += alpha * (G - v[s])
+    for states, _, rewards in episodes:
+        # Arrays (e.g., EpisodeStore views) are used without a copy
+        states = np.asarray(states)
+        if len(states) == 0:
+            continue
+
+        # Return at every step (missing rewards count as 0)
+        G = discounted_returns(rewards, gamma, len(states))
+        # Visits to each state in this episode
+        c = np.bincount(states, minlength=num_states)
+
+        if alpha == 0:
+            # Fold the episode's returns into the running mean of each state
+            N_s += c
+            seen = c > 0
+            G_sum = np.bincount(states, weights=G, minlength=num_states)
+            v[seen] += (G_sum[seen] - c[seen] * v[seen]) / N_s[seen]
+        else:
+            N_s += c
+            # Constant learning rate, with visits applied last step first:
+            # the visit with k earlier visits to its state is applied last
+            # but k, so its return keeps a weight alpha*(1-alpha)^k
+            order = np.argsort(states, kind='stable')
+            starts = np.cumsum(c) - c
+            occ = np.empty(len(states), dtype=np.int64)
+            occ[order] = np.arange(len(states)) - starts[states[order]]
+            w = alpha * (1 - alpha)**occ
+            v = ((1 - alpha)**c * v
+                 + np.bincount(states, weights=w * G, minlength=num_states))
      
     return v
 
 # Monte Carlo exploring-starts algorithm
+# episodes: optional iterable of exploring-start episodes used instead of
+# calling get_episode (generated by a fixed policy, so the improved policy
+# only shows up in episodes drawn after it)
 def mc_es(get_episode, initial_Q, initial_policy,
-          gamma, alpha, num_episodes=1e4):
+          gamma, alpha, num_episodes=1e4, episodes=None):
 
     # Initialization  
     Q = np.copy(initial_Q)
@@ -56,47 +98,39 @@ def mc_es(get_episode, initial_Q, initial_policy,
     num_states, num_actions = Q.shape
     N_sa = np.zeros([num_states,num_actions]) # counter of (s,a)
     
-    iteration = 0
+    if episodes is None:
+        # Generate each episode with exploring starts (a random initial
+        # state and action) from the current policy
+        episodes = (get_episode(policy, np.random.randint(0, num_states),
+                                np.random.randint(0, num_actions))
+                    for _ in range(int(num_episodes)))
     
-    # Continue through the specified episode count
-    while iteration < num_episodes:
-        
-        # Instantiate the exploring starts
-        init_s = np.random.randint(0, num_states)
-        init_a = np.random.randint(0, num_actions)
-        
-        # Generate an episode with exploring starts
-        states, actions, rewards = get_episode(policy, init_s, init_a) 
-        # Initialize G at 0
-        G = 0
-        # Go backwards through each step of the episode
-        for step in range(len(states)-1, -1, -1):
-            # Get state, action, and reward at current index
-            s = states[step]
-            a = actions[step]
-            r = rewards[step]
-            
-            # Only update the first-visit state-action pairs
-            update_Q = True
-            for prev in range(step-1, -1, -1):
-                if states[prev] == s and actions[prev] == a:
-                    update_Q = False
-             
-            # Update G
-            G = gamma*G + r
-            if update_Q:
-                # Update state-action counter
-                N_sa[s,a] += 1
-                if alpha == 0:
-                    # Compute expectation of the Q-value function
-                    Q[s,a] += (G - Q[s,a]) / N_sa[s,a]
-                else:
-                    # Update the Q-value function with a constant learning rate
-                    Q[s,a] += (G - Q[s,a]) * alpha
-                
-                # Update the policy
-                policy[s] = np.eye(num_actions)[np.argmax(Q[s])]
-        
-        iteration += 1
+    # Continue through the episodes
+    for states, actions, rewards in episodes:
+        states = np.asarray(states)
+        actions = np.asarray(actions)
+        if len(states) == 0:
+            continue
+        # Return at every step
+        G = discounted_returns(rewards, gamma, len(states))
+
+        # Only update the first-visit state-action pairs (the first index of
+        # each distinct pair, instead of rescanning earlier steps)
+        _, first = np.unique(states.astype(np.int64) * num_actions + actions,
+                             return_index=True)
+        s, a, G = states[first], actions[first], G[first]
+
+        # Each pair appears once, so the updates do not collide
+        N_sa[s,a] += 1
+        if alpha == 0:
+            # Compute expectation of the Q-value function
+            Q[s,a] += (G - Q[s,a]) / N_sa[s,a]
+        else:
+            # Update the Q-value function with a constant learning rate
+            Q[s,a] += (G - Q[s,a]) * alpha
+
+        # Update the policy of every touched state
+        touched = np.unique(s)
+        policy[touched] = np.eye(num_actions)[np.argmax(Q[touched], axis=1)]
         
     return Q, policy
\ No newline at end of file
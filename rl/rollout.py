@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Parallel, reproducibly seeded episode generation
+Andrew J. Graves
+10/18/26
+"""
+
+# Import modules
+import os
+from multiprocessing import Pool
+import numpy as np
+
+# Generate one chunk of episodes (runs in a worker, or in the caller when
+# num_workers=0)
+# get_episode draws from np.random, which is seeded from the chunk's own
+# SeedSequence, so a chunk's episodes do not depend on which worker runs it;
+# the previous global state is restored afterwards, so the caller's np.random
+# stream is left as it was
+def _rollout_chunk(args):
+
+    get_episode, policy, seed_seq, num, starts = args
+    state = np.random.get_state()
+    np.random.seed(seed_seq.generate_state(4))
+
+    episodes = []
+    try:
+        for _ in range(num):
+            if starts is None:
+                episodes.append(get_episode(policy))
+            else:
+                # Exploring starts: a random initial state and action
+                init_s = np.random.randint(0, starts[0])
+                init_a = np.random.randint(0, starts[1])
+                episodes.append(get_episode(policy, init_s, init_a))
+    finally:
+        np.random.set_state(state)
+    return episodes
+
+# Stream num_episodes episodes of get_episode(policy) from a process pool
+# seed: entropy of the root np.random.SeedSequence; chunk i is seeded by its
+# i-th spawned child, so the stream only depends on seed and chunk_size
+# num_workers: pool size (0 generates the same stream in this process)
+# chunk_size: episodes per task; episodes are yielded in order as chunks finish
+# starts: (num_states, num_actions) to draw exploring starts (as mc_es does)
+# get_episode must be picklable (a module-level function), and the policy is
+# the one passed in, so use this with learners that evaluate a fixed policy
+def rollouts(get_episode, policy, num_episodes, seed=None, num_workers=None,
+             chunk_size=16, starts=None):
+
+    # One child seed per chunk
+    num_episodes = int(num_episodes)
+    sizes = [min(chunk_size, num_episodes - i)
+             for i in range(0, num_episodes, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = ((get_episode, policy, seed_seq, num, starts)
+             for seed_seq, num in zip(seeds, sizes))
+
+    # Serial fallback with identical episodes
+    if num_workers == 0:
+        for task in tasks:
+            yield from _rollout_chunk(task)
+        return
+
+    with Pool(num_workers or os.cpu_count()) as pool:
+        # imap keeps the chunk order and hands each chunk over when it is ready
+        for chunk in pool.imap(_rollout_chunk, tasks):
+            yield from chunk
@@ -9,14 +9,19 @@ Andrew J. Graves
 import numpy as np
 
 # TD(0) algorithm
-def td_0(get_episode, policy, initial_v, gamma, alpha, num_episodes=1):
+# episodes: optional iterable of (states, actions, rewards), e.g. from
+# rollout.rollouts, used instead of calling get_episode
+def td_0(get_episode, policy, initial_v, gamma, alpha, num_episodes=1,
+         episodes=None):
 # This function implements TD(0).
 
     # Initialize value function
     v = np.copy(initial_v)
+    if episodes is None:
+        # Generate the episodes one at a time
+        episodes = (get_episode(policy) for _ in range(int(num_episodes)))
     
-    for ep in range(int(num_episodes)):
-        states, _, rewards = get_episode(policy) # generate an episode
+    for states, _, rewards in episodes:
         
         # Iterate through all non-terminal states
         for idx, s in enumerate(states[:-1]):
@@ -28,13 +33,18 @@ def td_0(get_episode, policy, initial_v, gamma, alpha, num_episodes=1):
     return v
 
 # n-step TD algorithm
-def td_n(get_episode, policy, initial_v, n, gamma, alpha, num_episodes=1):
+# episodes: optional iterable of (states, actions, rewards), e.g. from
+# rollout.rollouts, used instead of calling get_episode
+def td_n(get_episode, policy, initial_v, n, gamma, alpha, num_episodes=1,
+         episodes=None):
 
     # Initialize value function
     v = np.copy(initial_v)
+    if episodes is None:
+        # Generate the episodes one at a time
+        episodes = (get_episode(policy) for _ in range(int(num_episodes)))
     
-    for ep in range(int(num_episodes)):
-        states, _, rewards = get_episode(policy) # generate an episode
+    for states, _, rewards in episodes:
         
         # Initialize T, tau, and t (counter)
         T = np.inf
@@ -65,14 +75,18 @@ def td_n(get_episode, policy, initial_v, n, gamma, alpha, num_episodes=1):
     return v
 
 # Backward-view TD($\lambda$) algorithm
+# episodes: optional iterable of (states, actions, rewards), e.g. from
+# rollout.rollouts, used instead of calling get_episode
 def td_lambda(get_episode, policy, initial_v, lambda_, gamma, alpha,
-              num_episodes=1):
+              num_episodes=1, episodes=None):
 
     # Initialization
     v = np.copy(initial_v) # value function
+    if episodes is None:
+        # Generate the episodes one at a time
+        episodes = (get_episode(policy) for _ in range(int(num_episodes)))
 
-    for ep in range(int(num_episodes)):
-        states, _, rewards = get_episode(policy) # generate an episode
+    for states, _, rewards in episodes:
         # Initialize eligibility traces to 0
         e = np.zeros(len(v))
 